@@ -2,15 +2,137 @@
 Audit logging utilities.
 Helpers para crear y consultar logs de auditoría.
 """
-from typing import Optional, Dict, Any, List
-from uuid import UUID
-from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, AsyncIterator, NamedTuple
+from uuid import UUID, uuid4
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass
+import asyncio
+import logging
+import time
+import os
+import re
 from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, delete
+from sqlalchemy import select, func, delete, insert, lambda_stmt, text
 
 from .models import AuditLog, AuditCategory, AuditAction, User
-import json
+from .database import engine, AsyncSessionLocal
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# AUDIT QUEUE (BACKGROUND WRITER)
+# ============================================================================
+
+# Un lote se escribe al llegar a AUDIT_BATCH_SIZE eventos o tras AUDIT_BATCH_TIMEOUT
+AUDIT_QUEUE_MAXSIZE = int(os.getenv("AUDIT_QUEUE_MAXSIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_BATCH_TIMEOUT = float(os.getenv("AUDIT_BATCH_TIMEOUT", "0.2"))  # segundos
+
+# La cola y el worker se crean en el lifespan de la aplicación (start_audit_worker)
+# para que queden ligados al event loop que los va a consumir.
+AUDIT_QUEUE: Optional[asyncio.Queue] = None
+_audit_worker_task: Optional[asyncio.Task] = None
+
+
+# Sentencia Core reutilizada por el worker (las filas ya llegan como dicts completos)
+_AUDIT_INSERT = AuditLog.__table__.insert()
+
+# Columnas de audit_logs con el bind processor de SQLAlchemy de cada tipo, para
+# convertir las filas a valores de asyncpg igual que lo haría el INSERT
+_AUDIT_COPY_COLUMNS = [
+    (column.name, column.type.dialect_impl(engine.dialect).bind_processor(engine.dialect))
+    for column in AuditLog.__table__.columns
+]
+
+
+async def _copy_audit_rows(rows: List[Dict[str, Any]]) -> None:
+    """Escribe un lote con COPY binario (copy_records_to_table de asyncpg)."""
+    records = [
+        tuple(process(row[name]) if process else row[name] for name, process in _AUDIT_COPY_COLUMNS)
+        for row in rows
+    ]
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            AuditLog.__tablename__,
+            records=records,
+            columns=[name for name, _ in _AUDIT_COPY_COLUMNS],
+        )
+
+
+async def _write_audit_rows(rows: List[Dict[str, Any]]) -> None:
+    """
+    Escribe un lote de logs con un único COPY (sin sesión ni ORM).
+    Si el lote falla (p.ej. un usuario borrado entre medias), reintenta fila a fila
+    con INSERT para no perder el resto de eventos.
+    """
+    if len(rows) > 1:
+        try:
+            await _copy_audit_rows(rows)
+            return
+        except Exception:
+            logger.exception("Error writing audit log batch (%d rows), retrying one by one", len(rows))
+    
+    for row in rows:
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(_AUDIT_INSERT, row)
+        except Exception:
+            logger.exception("Error writing audit log")
+
+
+async def _audit_worker() -> None:
+    """Consume la cola de auditoría y escribe los eventos en lotes."""
+    loop = asyncio.get_running_loop()
+    while True:
+        rows = [await AUDIT_QUEUE.get()]
+        deadline = loop.time() + AUDIT_BATCH_TIMEOUT
+        
+        while len(rows) < AUDIT_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(await asyncio.wait_for(AUDIT_QUEUE.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        try:
+            await _write_audit_rows(rows)
+        finally:
+            for _ in rows:
+                AUDIT_QUEUE.task_done()
+
+
+async def start_audit_worker() -> None:
+    """Crea la cola de auditoría y arranca el worker. Llamar en el startup."""
+    global AUDIT_QUEUE, _audit_worker_task
+    AUDIT_QUEUE = asyncio.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+    _audit_worker_task = asyncio.create_task(_audit_worker())
+
+
+async def stop_audit_worker(timeout: float = 5.0) -> None:
+    """Vacía la cola pendiente y detiene el worker. Llamar en el shutdown."""
+    global AUDIT_QUEUE, _audit_worker_task
+    if _audit_worker_task is None:
+        return
+    
+    try:
+        await asyncio.wait_for(AUDIT_QUEUE.join(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Audit queue not drained on shutdown, %d events lost", AUDIT_QUEUE.qsize())
+    
+    _audit_worker_task.cancel()
+    try:
+        await _audit_worker_task
+    except asyncio.CancelledError:
+        pass
+    
+    AUDIT_QUEUE = None
+    _audit_worker_task = None
 
 
 # ============================================================================
@@ -30,12 +152,16 @@ async def create_audit_log(
     user_agent: Optional[str] = None,
     success: bool = True,
     error_message: Optional[str] = None
-) -> AuditLog:
+) -> None:
     """
-    Crea un registro de auditoría.
+    Encola un registro de auditoría para que el worker lo escriba en segundo plano.
+    No añade ningún round-trip a la base de datos en el camino de la petición.
+    Si el worker no está arrancado (scripts, tests sin lifespan), escribe directamente
+    con create_audit_log_sync, que hace commit de `db`: los cambios pendientes del
+    llamador se confirman junto con el log (delete_user_me cuenta con ello).
     
     Args:
-        db: Sesión de base de datos
+        db: Sesión de base de datos (solo se usa si el worker no está activo)
         category: Categoría del evento
         action: Acción específica
         user_id: ID del usuario (opcional para eventos del sistema)
@@ -47,29 +173,112 @@ async def create_audit_log(
         user_agent: User agent del cliente
         success: Si la operación fue exitosa
         error_message: Mensaje de error si falló
-        
+    """
+    if AUDIT_QUEUE is None:
+        await create_audit_log_sync(
+            db, category, action, user_id, workspace_id, resource_type,
+            resource_id, payload, ip_address, user_agent, success, error_message
+        )
+        return
+    
+    row = {
+        "id": uuid4(),
+        "user_id": user_id,
+        "category": category,
+        "action": action,
+        "workspace_id": workspace_id,
+        "resource_type": resource_type,
+        "resource_id": resource_id,
+        # Serializado aquí con orjson; el worker solo envía los bytes
+        "payload": orjson.dumps(payload) if payload is not None else None,
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "success": success,
+        "error_message": error_message,
+        # Hora del evento (no la del INSERT por lotes, que comparte now() en toda la transacción)
+        "created_at": datetime.now(timezone.utc)
+    }
+    try:
+        AUDIT_QUEUE.put_nowait(row)
+    except asyncio.QueueFull:
+        # Cola llena: esperar a que el worker libere espacio (backpressure)
+        await AUDIT_QUEUE.put(row)
+
+
+async def create_audit_log_sync(
+    db: AsyncSession,
+    category: AuditCategory,
+    action: AuditAction,
+    user_id: Optional[UUID] = None,
+    workspace_id: Optional[UUID] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    success: bool = True,
+    error_message: Optional[str] = None
+) -> UUID:
+    """
+    Crea un registro de auditoría de forma síncrona en la sesión indicada.
+    Usar solo cuando se necesita el ID del log o cuando debe escribirse
+    en la misma transacción que la operación auditada. Hace commit de la sesión,
+    incluidos los cambios que el llamador tuviera pendientes.
+    
     Returns:
-        AuditLog creado
+        ID del AuditLog creado
     """
-    audit_log = AuditLog(
-        user_id=user_id,
-        category=category,
-        action=action,
-        workspace_id=workspace_id,
-        resource_type=resource_type,
-        resource_id=resource_id,
-        payload=payload,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        success=success,
-        error_message=error_message
+    result = await db.execute(
+        insert(AuditLog)
+        .values(
+            user_id=user_id,
+            category=category,
+            action=action,
+            workspace_id=workspace_id,
+            resource_type=resource_type,
+            resource_id=resource_id,
+            payload=payload,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            success=success,
+            error_message=error_message
+        )
+        .returning(AuditLog.id)
     )
-    
-    db.add(audit_log)
+    audit_log_id = result.scalar_one()
     await db.commit()
-    await db.refresh(audit_log)
     
-    return audit_log
+    return audit_log_id
+
+
+# ============================================================================
+# CONTEXTO DE LA PETICIÓN
+# ============================================================================
+
+@dataclass(slots=True)
+class RequestCtx:
+    """Datos de la petición HTTP que se guardan en los logs de auditoría."""
+    ip: Optional[str]
+    ua: Optional[str]
+
+
+def get_request_ctx(request: Optional[Request]) -> Optional[RequestCtx]:
+    """
+    Devuelve el contexto de auditoría de la petición.
+    Se construye la primera vez que se necesita y se reutiliza (request.state)
+    en el resto de eventos registrados durante la misma petición.
+    """
+    if request is None:
+        return None
+    
+    ctx = getattr(request.state, "audit_ctx", None)
+    if ctx is None:
+        ctx = RequestCtx(
+            ip=request.client.host if request.client else None,
+            ua=request.headers.get("user-agent")
+        )
+        request.state.audit_ctx = ctx
+    return ctx
 
 
 async def log_auth_event(
@@ -80,7 +289,7 @@ async def log_auth_event(
     success: bool = True,
     request: Optional[Request] = None,
     **kwargs
-) -> AuditLog:
+) -> None:
     """
     Registra un evento de autenticación.
     
@@ -93,15 +302,16 @@ async def log_auth_event(
     """
     payload = {"email": email} if email else {}
     payload.update(kwargs)
+    ctx = get_request_ctx(request)
     
-    return await create_audit_log(
+    await create_audit_log(
         db=db,
         category=AuditCategory.AUTH,
         action=action,
         user_id=user_id,
         payload=payload,
-        ip_address=request.client.host if request else None,
-        user_agent=request.headers.get("user-agent") if request else None,
+        ip_address=ctx.ip if ctx else None,
+        user_agent=ctx.ua if ctx else None,
         success=success
     )
 
@@ -113,7 +323,7 @@ async def log_workspace_event(
     user_id: UUID,
     request: Optional[Request] = None,
     **kwargs
-) -> AuditLog:
+) -> None:
     """
     Registra un evento relacionado con workspaces.
     
@@ -125,7 +335,8 @@ async def log_workspace_event(
         - MEMBER_REMOVE
         - ROLE_CHANGE
     """
-    return await create_audit_log(
+    ctx = get_request_ctx(request)
+    await create_audit_log(
         db=db,
         category=AuditCategory.WORKSPACE,
         action=action,
@@ -134,8 +345,8 @@ async def log_workspace_event(
         resource_type="workspace",
         resource_id=str(workspace_id),
         payload=kwargs,
-        ip_address=request.client.host if request else None,
-        user_agent=request.headers.get("user-agent") if request else None
+        ip_address=ctx.ip if ctx else None,
+        user_agent=ctx.ua if ctx else None
     )
 
 
@@ -147,7 +358,7 @@ async def log_tender_event(
     user_id: Optional[UUID] = None,
     request: Optional[Request] = None,
     **kwargs
-) -> AuditLog:
+) -> None:
     """
     Registra un evento relacionado con licitaciones.
     
@@ -158,7 +369,8 @@ async def log_tender_event(
         - TENDER_VIEW
         - TENDER_ANALYZE
     """
-    return await create_audit_log(
+    ctx = get_request_ctx(request)
+    await create_audit_log(
         db=db,
         category=AuditCategory.TENDER,
         action=action,
@@ -167,8 +379,8 @@ async def log_tender_event(
         resource_type="tender",
         resource_id=tender_id,
         payload=kwargs,
-        ip_address=request.client.host if request else None,
-        user_agent=request.headers.get("user-agent") if request else None
+        ip_address=ctx.ip if ctx else None,
+        user_agent=ctx.ua if ctx else None
     )
 
 
@@ -180,7 +392,7 @@ async def log_document_event(
     workspace_id: UUID,
     user_id: Optional[UUID] = None,
     **kwargs
-) -> AuditLog:
+) -> None:
     """
     Registra un evento relacionado con documentos.
     
@@ -189,7 +401,7 @@ async def log_document_event(
         - DOCUMENT_DELETE
         - DOCUMENT_EXTRACT
     """
-    return await create_audit_log(
+    await create_audit_log(
         db=db,
         category=AuditCategory.DOCUMENT,
         action=action,
@@ -211,7 +423,7 @@ async def log_n8n_event(
     success: bool = True,
     error_message: Optional[str] = None,
     **kwargs
-) -> AuditLog:
+) -> None:
     """
     Registra un evento de workflows n8n.
     
@@ -220,7 +432,7 @@ async def log_n8n_event(
         - WORKFLOW_COMPLETE
         - WORKFLOW_ERROR
     """
-    return await create_audit_log(
+    await create_audit_log(
         db=db,
         category=AuditCategory.N8N,
         action=action,
@@ -235,28 +447,56 @@ async def log_n8n_event(
 # AUDIT LOG QUERIES
 # ============================================================================
 
+class AuditLogRow(NamedTuple):
+    """
+    Fila de solo lectura devuelta por las consultas de listado.
+    Evita la hidratación ORM y no trae columnas pesadas (payload, user_agent).
+    """
+    id: UUID
+    user_id: Optional[UUID]
+    category: AuditCategory
+    action: AuditAction
+    workspace_id: Optional[UUID]
+    resource_type: Optional[str]
+    resource_id: Optional[str]
+    success: bool
+    created_at: datetime
+
+
+_AUDIT_COLS = (
+    AuditLog.id,
+    AuditLog.user_id,
+    AuditLog.category,
+    AuditLog.action,
+    AuditLog.workspace_id,
+    AuditLog.resource_type,
+    AuditLog.resource_id,
+    AuditLog.success,
+    AuditLog.created_at,
+)
+
 async def get_user_activity(
     db: AsyncSession,
     user_id: UUID,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 100
-) -> List[AuditLog]:
+) -> List[AuditLogRow]:
     """
     Obtiene la actividad reciente de un usuario.
     """
-    query = select(AuditLog).where(AuditLog.user_id == user_id)
+    query = lambda_stmt(lambda: select(*_AUDIT_COLS).where(AuditLog.user_id == user_id))
     
     if start_date:
-        query = query.where(AuditLog.created_at >= start_date)
+        query += lambda s: s.where(AuditLog.created_at >= start_date)
     
     if end_date:
-        query = query.where(AuditLog.created_at <= end_date)
+        query += lambda s: s.where(AuditLog.created_at <= end_date)
     
-    query = query.order_by(AuditLog.created_at.desc()).limit(limit)
+    query += lambda s: s.order_by(AuditLog.created_at.desc()).limit(limit)
     
     result = await db.execute(query)
-    return result.scalars().all()
+    return [AuditLogRow._make(row) for row in result.all()]
 
 
 async def get_workspace_activity(
@@ -265,22 +505,22 @@ async def get_workspace_activity(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 100
-) -> List[AuditLog]:
+) -> List[AuditLogRow]:
     """
     Obtiene la actividad reciente de un workspace.
     """
-    query = select(AuditLog).where(AuditLog.workspace_id == workspace_id)
+    query = lambda_stmt(lambda: select(*_AUDIT_COLS).where(AuditLog.workspace_id == workspace_id))
     
     if start_date:
-        query = query.where(AuditLog.created_at >= start_date)
+        query += lambda s: s.where(AuditLog.created_at >= start_date)
     
     if end_date:
-        query = query.where(AuditLog.created_at <= end_date)
+        query += lambda s: s.where(AuditLog.created_at <= end_date)
     
-    query = query.order_by(AuditLog.created_at.desc()).limit(limit)
+    query += lambda s: s.order_by(AuditLog.created_at.desc()).limit(limit)
     
     result = await db.execute(query)
-    return result.scalars().all()
+    return [AuditLogRow._make(row) for row in result.all()]
 
 
 async def get_failed_operations(
@@ -288,22 +528,22 @@ async def get_failed_operations(
     category: Optional[AuditCategory] = None,
     start_date: Optional[datetime] = None,
     limit: int = 100
-) -> List[AuditLog]:
+) -> List[AuditLogRow]:
     """
     Obtiene operaciones fallidas para monitoreo.
     """
-    query = select(AuditLog).where(AuditLog.success == False)
+    query = lambda_stmt(lambda: select(*_AUDIT_COLS).where(AuditLog.success == False))
     
     if category:
-        query = query.where(AuditLog.category == category)
+        query += lambda s: s.where(AuditLog.category == category)
     
     if start_date:
-        query = query.where(AuditLog.created_at >= start_date)
+        query += lambda s: s.where(AuditLog.created_at >= start_date)
     
-    query = query.order_by(AuditLog.created_at.desc()).limit(limit)
+    query += lambda s: s.order_by(AuditLog.created_at.desc()).limit(limit)
     
     result = await db.execute(query)
-    return result.scalars().all()
+    return [AuditLogRow._make(row) for row in result.all()]
 
 
 async def get_resource_history(
@@ -311,21 +551,50 @@ async def get_resource_history(
     resource_type: str,
     resource_id: str,
     limit: int = 50
-) -> List[AuditLog]:
+) -> List[AuditLogRow]:
     """
     Obtiene el historial completo de un recurso específico.
     """
     result = await db.execute(
-        select(AuditLog)
-        .where(
-            AuditLog.resource_type == resource_type,
-            AuditLog.resource_id == resource_id
+        lambda_stmt(
+            lambda: select(*_AUDIT_COLS)
+            .where(
+                AuditLog.resource_type == resource_type,
+                AuditLog.resource_id == resource_id
+            )
+            .order_by(AuditLog.created_at.desc())
+            .limit(limit)
         )
-        .order_by(AuditLog.created_at.desc())
-        .limit(limit)
     )
     
-    return result.scalars().all()
+    return [AuditLogRow._make(row) for row in result.all()]
+
+
+# Contadores de fallos de autenticación por IP en Redis (ventana deslizante de
+# buckets de 1 minuto). En un login fallido no se conoce el usuario, así que los
+# filtros por usuario siguen consultando Postgres.
+FAILED_AUTH_WINDOW_MINUTES = 15
+
+
+def _failed_auth_subject(user_id: Optional[UUID], ip_address: Optional[str]) -> Optional[str]:
+    """Clave base del contador, solo para consultas por IP (el resto usa Postgres)."""
+    if ip_address and not user_id:
+        return f"af:ip:{ip_address}"
+    return None
+
+
+async def record_failed_auth(redis_client: Any, ip_address: Optional[str]) -> None:
+    """Incrementa el contador de fallos de autenticación de la IP en Redis."""
+    if not ip_address:
+        return
+    key = f"af:ip:{ip_address}:{int(time.time()) // 60}"
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, (FAILED_AUTH_WINDOW_MINUTES + 1) * 60)
+            await pipe.execute()
+    except Exception:
+        logger.exception("Error recording failed auth attempt")
 
 
 async def detect_suspicious_activity(
@@ -333,12 +602,30 @@ async def detect_suspicious_activity(
     user_id: Optional[UUID] = None,
     ip_address: Optional[str] = None,
     time_window_minutes: int = 15,
-    max_failed_attempts: int = 5
+    max_failed_attempts: int = 5,
+    redis_client: Any = None
 ) -> bool:
     """
     Detecta actividad sospechosa (intentos de login fallidos, etc.).
+    Si se pasa un cliente de Redis y solo se filtra por IP, se usan los
+    contadores de record_failed_auth; la consulta a Postgres queda como
+    alternativa lenta.
     """
-    threshold_time = datetime.utcnow() - timedelta(minutes=time_window_minutes)
+    subject = _failed_auth_subject(user_id, ip_address)
+    if (
+        redis_client is not None
+        and subject is not None
+        and time_window_minutes <= FAILED_AUTH_WINDOW_MINUTES
+    ):
+        minute = int(time.time()) // 60
+        keys = [f"{subject}:{minute - i}" for i in range(time_window_minutes)]
+        try:
+            values = await redis_client.mget(keys)
+            return sum(int(v or 0) for v in values) >= max_failed_attempts
+        except Exception:
+            logger.exception("Error reading failed auth counters, falling back to Postgres")
+    
+    threshold_time = datetime.now(timezone.utc) - timedelta(minutes=time_window_minutes)
     
     query = select(func.count(AuditLog.id)).where(
         AuditLog.category == AuditCategory.AUTH,
@@ -376,49 +663,47 @@ async def get_activity_stats(
             "unique_users": 15
         }
     """
-    query = select(AuditLog)
+    filters = []
     
     if workspace_id:
-        query = query.where(AuditLog.workspace_id == workspace_id)
+        filters.append(AuditLog.workspace_id == workspace_id)
     
     if start_date:
-        query = query.where(AuditLog.created_at >= start_date)
+        filters.append(AuditLog.created_at >= start_date)
     
     if end_date:
-        query = query.where(AuditLog.created_at <= end_date)
-    
-    result = await db.execute(query)
-    logs = result.scalars().all()
-    
-    # Calcular estadísticas
-    total_events = len(logs)
+        filters.append(AuditLog.created_at <= end_date)
+    
+    # Conteo por (categoría, acción): de aquí salen ambos desgloses y el total.
+    # Las consultas van en serie porque una AsyncSession no admite operaciones concurrentes.
+    grouped = await db.execute(
+        select(AuditLog.category, AuditLog.action, func.count())
+        .where(*filters)
+        .group_by(AuditLog.category, AuditLog.action)
+    )
     
     by_category = {}
     by_action = {}
-    failed_operations = 0
-    unique_users = set()
     
-    for log in logs:
-        # Por categoría
-        by_category[log.category.value] = by_category.get(log.category.value, 0) + 1
-        
-        # Por acción
-        by_action[log.action.value] = by_action.get(log.action.value, 0) + 1
-        
-        # Operaciones fallidas
-        if not log.success:
-            failed_operations += 1
-        
-        # Usuarios únicos
-        if log.user_id:
-            unique_users.add(str(log.user_id))
+    for category, action, count in grouped:
+        by_category[category.value] = by_category.get(category.value, 0) + count
+        by_action[action.value] = by_action.get(action.value, 0) + count
+    
+    # Operaciones fallidas y usuarios únicos en una sola fila
+    totals = await db.execute(
+        select(
+            func.count().filter(AuditLog.success.is_(False)),
+            func.count(func.distinct(AuditLog.user_id))
+        ).where(*filters)
+    )
+    failed_operations, unique_users = totals.one()
     
     return {
-        "total_events": total_events,
+        "total_events": sum(by_category.values()),
         "by_category": by_category,
         "by_action": by_action,
         "failed_operations": failed_operations,
-        "unique_users": len(unique_users)
+        "unique_users": unique_users
     }
 
 
@@ -433,42 +718,47 @@ async def search_audit_logs(
     end_date: Optional[datetime] = None,
     success_only: Optional[bool] = None,
     limit: int = 100
-) -> List[AuditLog]:
+) -> List[AuditLogRow]:
     """
     Búsqueda avanzada de logs de auditoría.
     """
-    query = select(AuditLog)
+    # Cada combinación de filtros se compila una sola vez (lambda_stmt)
+    query = lambda_stmt(lambda: select(*_AUDIT_COLS))
     
-    # Filtro por usuario (requiere join)
+    # Filtro por usuario: subconsulta IN en lugar de JOIN, para que el LIMIT
+    # se pueda aplicar sobre el índice (user_id, created_at)
     if user_email:
-        query = query.join(User).where(User.email.ilike(f"%{user_email}%"))
+        email_pattern = f"%{user_email}%"
+        query += lambda s: s.where(
+            AuditLog.user_id.in_(select(User.id).where(User.email.ilike(email_pattern)))
+        )
     
     # Filtros simples
     if category:
-        query = query.where(AuditLog.category == category)
+        query += lambda s: s.where(AuditLog.category == category)
     
     if action:
-        query = query.where(AuditLog.action == action)
+        query += lambda s: s.where(AuditLog.action == action)
     
     if workspace_id:
-        query = query.where(AuditLog.workspace_id == workspace_id)
+        query += lambda s: s.where(AuditLog.workspace_id == workspace_id)
     
     if resource_id:
-        query = query.where(AuditLog.resource_id == resource_id)
+        query += lambda s: s.where(AuditLog.resource_id == resource_id)
     
     if start_date:
-        query = query.where(AuditLog.created_at >= start_date)
+        query += lambda s: s.where(AuditLog.created_at >= start_date)
     
     if end_date:
-        query = query.where(AuditLog.created_at <= end_date)
+        query += lambda s: s.where(AuditLog.created_at <= end_date)
     
     if success_only is not None:
-        query = query.where(AuditLog.success == success_only)
+        query += lambda s: s.where(AuditLog.success == success_only)
     
-    query = query.order_by(AuditLog.created_at.desc()).limit(limit)
+    query += lambda s: s.order_by(AuditLog.created_at.desc()).limit(limit)
     
     result = await db.execute(query)
-    return result.scalars().all()
+    return [AuditLogRow._make(row) for row in result.all()]
 
 
 # ============================================================================
@@ -480,37 +770,50 @@ async def export_audit_logs_to_json(
     workspace_id: Optional[UUID] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None
-) -> str:
+) -> AsyncIterator[bytes]:
     """
     Exporta logs de auditoría a JSON para compliance.
+    
+    Genera el array JSON por fragmentos leyendo con un cursor de servidor,
+    por lo que la memoria es constante independientemente del número de logs.
+    Pensado para devolverse con StreamingResponse(..., media_type="application/json").
     """
-    logs = await search_audit_logs(
-        db=db,
-        workspace_id=workspace_id,
-        start_date=start_date,
-        end_date=end_date,
-        limit=10000  # Sin límite para export
+    query = select(
+        AuditLog.id,
+        AuditLog.user_id,
+        AuditLog.category,
+        AuditLog.action,
+        AuditLog.workspace_id,
+        AuditLog.resource_type,
+        AuditLog.resource_id,
+        AuditLog.payload,
+        AuditLog.ip_address,
+        AuditLog.user_agent,
+        AuditLog.success,
+        AuditLog.error_message,
+        AuditLog.created_at
     )
     
-    export_data = []
-    for log in logs:
-        export_data.append({
-            "id": str(log.id),
-            "user_id": str(log.user_id) if log.user_id else None,
-            "category": log.category.value,
-            "action": log.action.value,
-            "workspace_id": str(log.workspace_id) if log.workspace_id else None,
-            "resource_type": log.resource_type,
-            "resource_id": log.resource_id,
-            "payload": log.payload,
-            "ip_address": log.ip_address,
-            "user_agent": log.user_agent,
-            "success": log.success,
-            "error_message": log.error_message,
-            "created_at": log.created_at.isoformat()
-        })
-    
-    return json.dumps(export_data, indent=2, ensure_ascii=False)
+    if workspace_id:
+        query = query.where(AuditLog.workspace_id == workspace_id)
+    
+    if start_date:
+        query = query.where(AuditLog.created_at >= start_date)
+    
+    if end_date:
+        query = query.where(AuditLog.created_at <= end_date)
+    
+    query = query.order_by(AuditLog.created_at.desc())
+    
+    yield b"["
+    first = True
+    # orjson serializa UUID, datetime y enums de forma nativa
+    async for row in await db.stream(query):
+        if not first:
+            yield b","
+        first = False
+        yield orjson.dumps(row._asdict())
+    yield b"]"
 
 
 async def cleanup_old_logs(
@@ -523,20 +826,170 @@ async def cleanup_old_logs(
     Returns:
         Número de logs eliminados
     """
-    cutoff_date = datetime.utcnow() - timedelta(days=days_to_keep)
-    
-    result = await db.execute(
-        select(func.count(AuditLog.id)).where(
-            AuditLog.created_at < cutoff_date
-        )
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_to_keep)
+    
+    # Los meses completos anteriores al corte se eliminan con DETACH + DROP (O(1))
+    deleted = await drop_expired_audit_partitions(cutoff_date)
+    
+    # El resto (mes frontera y partición por defecto) se borra por lotes: cada
+    # lote es una transacción corta en lugar de un único DELETE enorme
+    expired_ids = (
+        select(AuditLog.id)
+        .where(AuditLog.created_at < cutoff_date)
+        .limit(AUDIT_RETENTION_CHUNK_SIZE)
+        .scalar_subquery()
     )
-    count = result.scalar()
-
-    if count > 0:
-        # Eliminar logs antiguos
-        await db.execute(
-            delete(AuditLog).where(AuditLog.created_at < cutoff_date)
-        )
+    stmt = (
+        delete(AuditLog)
+        .where(AuditLog.created_at < cutoff_date, AuditLog.id.in_(expired_ids))
+        .execution_options(synchronize_session=False)
+    )
+    while True:
+        result = await db.execute(stmt)
         await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < AUDIT_RETENTION_CHUNK_SIZE:
+            break
+    
+    return deleted
+
+
+# ============================================================================
+# PARTICIONES MENSUALES
+# ============================================================================
+
+AUDIT_PARTITION_MONTHS_AHEAD = 2
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    """Primer día del mes desplazado `months` meses."""
+    years, month_index = divmod(month_start.month - 1 + months, 12)
+    return month_start.replace(year=month_start.year + years, month=month_index + 1, day=1)
+
+
+def audit_partition_name(month_start: datetime) -> str:
+    """Nombre de la partición mensual (audit_logs_YYYY_MM)."""
+    return f"audit_logs_{month_start:%Y_%m}"
+
+
+async def ensure_audit_partitions(
+    months_ahead: int = AUDIT_PARTITION_MONTHS_AHEAD,
+    since: Optional[datetime] = None,
+) -> None:
+    """
+    Crea, si no existen, las particiones mensuales de audit_logs para el mes
+    actual y los `months_ahead` siguientes.
     
-    return count
\ No newline at end of file
+    Con `since` se crean también las de los meses anteriores desde esa fecha
+    (lo usa la migración de una tabla sin particionar antes de copiar sus filas).
+    
+    Si la partición por defecto ya contiene filas de ese mes Postgres rechaza
+    la partición; se registra el error y esas filas permanecen en
+    audit_logs_default.
+    """
+    now = datetime.now(timezone.utc)
+    current = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+    start = current
+    if since is not None and since < current:
+        start = datetime(since.year, since.month, 1, tzinfo=timezone.utc)
+    last = _add_months(current, months_ahead)
+    
+    while start <= last:
+        end = _add_months(start, 1)
+        name = audit_partition_name(start)
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_logs "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+        except Exception:
+            logger.exception("Error creating audit partition %s", name)
+        start = end
+
+
+_PARTITION_NAME_RE = re.compile(r"^audit_logs_(\d{4})_(\d{2})$")
+
+
+async def drop_expired_audit_partitions(cutoff_date: datetime) -> int:
+    """
+    Elimina (DETACH + DROP) las particiones mensuales cuyo mes completo es
+    anterior a `cutoff_date`.
+    
+    Returns:
+        Número de logs eliminados
+    """
+    async with engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'audit_logs'::regclass"
+        ))
+        partitions = result.scalars().all()
+    
+    deleted = 0
+    for name in sorted(partitions):
+        match = _PARTITION_NAME_RE.match(name)
+        if not match:
+            continue
+        start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if _add_months(start, 1) > cutoff_date:
+            continue
+        try:
+            async with engine.begin() as conn:
+                count = await conn.scalar(text(f"SELECT count(*) FROM {name}"))
+                await conn.execute(text(f"ALTER TABLE audit_logs DETACH PARTITION {name}"))
+                await conn.execute(text(f"DROP TABLE {name}"))
+            deleted += count
+        except Exception:
+            logger.exception("Error dropping audit partition %s", name)
+    
+    return deleted
+
+
+# ============================================================================
+# MANTENIMIENTO PERIÓDICO (PARTICIONES Y RETENCIÓN)
+# ============================================================================
+
+# Días de retención de los logs (0 desactiva el borrado)
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+AUDIT_RETENTION_CHUNK_SIZE = 10000
+AUDIT_MAINTENANCE_INTERVAL = int(os.getenv("AUDIT_MAINTENANCE_INTERVAL", "86400"))  # segundos
+
+_audit_maintenance_task: Optional[asyncio.Task] = None
+
+
+async def _audit_maintenance_worker() -> None:
+    """
+    Crea las particiones de los próximos meses y aplica la retención, una vez
+    por AUDIT_MAINTENANCE_INTERVAL.
+    """
+    while True:
+        await asyncio.sleep(AUDIT_MAINTENANCE_INTERVAL)
+        try:
+            await ensure_audit_partitions()
+            if AUDIT_RETENTION_DAYS > 0:
+                async with AsyncSessionLocal() as db:
+                    deleted = await cleanup_old_logs(db, AUDIT_RETENTION_DAYS)
+                logger.info("Audit retention: %d logs older than %d days removed", deleted, AUDIT_RETENTION_DAYS)
+        except Exception:
+            logger.exception("Error in audit maintenance")
+
+
+async def start_audit_maintenance() -> None:
+    """Arranca la tarea de mantenimiento de auditoría. Llamar en el startup."""
+    global _audit_maintenance_task
+    if _audit_maintenance_task is None:
+        _audit_maintenance_task = asyncio.create_task(_audit_maintenance_worker())
+
+
+async def stop_audit_maintenance() -> None:
+    """Detiene la tarea de mantenimiento. Llamar en el shutdown."""
+    global _audit_maintenance_task
+    if _audit_maintenance_task is None:
+        return
+    _audit_maintenance_task.cancel()
+    try:
+        await _audit_maintenance_task
+    except asyncio.CancelledError:
+        pass
+    _audit_maintenance_task = None
@@ -2,24 +2,94 @@
 Authentication utilities for password hashing and JWT token management.
 """
 from __future__ import annotations
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Any
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import jwt
+from jwt import PyJWTError as JWTError
+from jwt.algorithms import HMACAlgorithm
+from jwt.utils import base64url_encode
+import orjson
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+import bcrypt
+from cachetools import TTLCache
+from rbloom import Bloom
+import anyio
+import asyncio
+import logging
 from fastapi import Depends, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, lambda_stmt
+from sqlalchemy.engine import Row
 import os
-import uuid
+import time
+import hashlib
+import hmac
+import secrets
+import itertools
 from .models import User
-from .schemas import TokenData
+from .schemas import TokenData, CachedUser
 from .database import get_db
-from .redis_client import get_redis
-
-
-# Password hashing context with bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .redis_client import get_redis, redis_session
+from .jwt_cache import SieveCache
+
+logger = logging.getLogger(__name__)
+
+# Password hashing: new hashes use Argon2id (argon2-cffi); legacy bcrypt hashes
+# are verified with the bcrypt C extension and rehashed on the next successful
+# login. Both libraries are called directly, without passlib's dispatch layer.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", str(64 * 1024)))  # KiB
+# One lane per hash: concurrency comes from hashing several logins at once (see below)
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+_password_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+# Dedicated bound for password hashing threads. argon2 and bcrypt release the GIL and
+# each Argon2 hash runs ARGON2_PARALLELISM lanes, so by default as many hashes run at
+# once as fit one lane per core (each holding ARGON2_MEMORY_COST KiB); excess requests
+# queue here instead of oversubscribing the CPU or starving anyio's shared thread pool
+PASSWORD_HASH_WORKERS = int(os.getenv(
+    "PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // ARGON2_PARALLELISM))
+))
+_hash_limiter = anyio.CapacityLimiter(PASSWORD_HASH_WORKERS)
+
+# Hash verified when the user doesn't exist, so both paths take the same time.
+# It matches the Argon2id accounts only: an account still holding a legacy bcrypt
+# hash verifies at bcrypt's cost until its next login rehashes it, so until then
+# its timing differs from that of an unknown email
+_DUMMY_HASH = _password_hasher.hash("dummy-password-for-timing-equalization")
+
+
+def _verify_and_update(plain_password: str, hashed_password: str | None) -> tuple[bool, str | None]:
+    """Blocking verification; returns (matches, new_hash or None)."""
+    if not hashed_password:
+        return False, None
+    if hashed_password.startswith("$argon2"):
+        try:
+            _password_hasher.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False, None
+        if _password_hasher.check_needs_rehash(hashed_password):
+            return True, _password_hasher.hash(plain_password)
+        return True, None
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        # bcrypt only uses the first 72 bytes (passlib truncated them the same way)
+        try:
+            matches = bcrypt.checkpw(plain_password.encode()[:72], hashed_password.encode())
+        except ValueError:
+            return False, None
+        return matches, _password_hasher.hash(plain_password) if matches else None
+    return False, None
+
+
+def _verify(plain_password: str, hashed_password: str | None) -> bool:
+    return _verify_and_update(plain_password, hashed_password)[0]
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
@@ -30,16 +100,72 @@ if not SECRET_KEY:
     raise ValueError("La variable de entorno SECRET_KEY debe estar configurada con una clave segura.")
 
 ALGORITHM = "HS256"
+# Signing state prepared once: jwt.encode() re-validates and re-encodes the key
+# and re-serializes the (constant) header on every call. The keyed HMAC
+# template already holds the ipad/opad state, so each token only copies it.
+_jwt_signing_key = HMACAlgorithm(HMACAlgorithm.SHA256).prepare_key(SECRET_KEY)
+_jwt_hmac_template = hmac.new(_jwt_signing_key, digestmod=hashlib.sha256)
+_JWT_HEADER_SEGMENT = base64url_encode(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+ACCESS_TOKEN_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_EXPIRE_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+# User cache (Redis) for authenticated requests
+USER_CACHE_TTL_SECONDS = 60
+# In-process copy of the cached user; a change made through another worker is
+# seen after at most this delay (same trade-off as the blacklist cache below)
+USER_LOCAL_CACHE_TTL_SECONDS = 5
+_user_cache: TTLCache = TTLCache(maxsize=10000, ttl=USER_LOCAL_CACHE_TTL_SECONDS)
+
+# In-process caches for the authentication hot path.
+# Decoded JWT payloads keyed by a hash of the token, SIEVE-evicted (exp is checked on hit)
+TOKEN_CACHE_MAXSIZE = 50000
+_token_cache = SieveCache(maxsize=TOKEN_CACHE_MAXSIZE)
+# Blacklist lookups; a token revoked from another worker is honoured after at most this delay
+BLACKLIST_CACHE_TTL_SECONDS = 5
+_blacklist_cache: TTLCache = TTLCache(maxsize=50000, ttl=BLACKLIST_CACHE_TTL_SECONDS)
+
+# Bloom filter of blacklisted JTIs used as a negative cache: a JTI that is not in
+# the filter cannot be blacklisted, so the Redis lookup is skipped. Every worker
+# seeds its filter from Redis and keeps it current through a pub/sub channel.
+# Bits are never cleared when a blacklisted JTI expires, so the filter is
+# rebuilt from Redis every BLACKLIST_BLOOM_REBUILD_SECONDS (and on reconnect)
+# to keep its false-positive rate near the configured one.
+BLACKLIST_CHANNEL = "bl:add"
+BLACKLIST_BLOOM_CAPACITY = 1_000_000
+BLACKLIST_BLOOM_ERROR_RATE = 0.001
+BLACKLIST_BLOOM_REBUILD_SECONDS = int(os.getenv("BLACKLIST_BLOOM_REBUILD_SECONDS", "3600"))
+_blacklist_bloom = Bloom(BLACKLIST_BLOOM_CAPACITY, BLACKLIST_BLOOM_ERROR_RATE)
+_blacklist_bloom_ready = False
+_blacklist_sync_task: asyncio.Task | None = None
+
+# JTI generation: worker id (16 bits) | process start (48 bits) | counter (64 bits).
+# Unique across processes without reading the OS random source for every token.
+_jti_prefix = ""
+_jti_counter = itertools.count(1)
+
+
+def _reset_jti_generator() -> None:
+    global _jti_prefix, _jti_counter
+    worker_id = secrets.randbits(16)
+    start = time.time_ns() & ((1 << 48) - 1)
+    _jti_prefix = f"{worker_id:04x}{start:012x}"
+    _jti_counter = itertools.count(1)
+
+
+_reset_jti_generator()
+# Forked workers (e.g. gunicorn --preload) must not share the parent's sequence
+os.register_at_fork(after_in_child=_reset_jti_generator)
 
 # Cookie settings
 SECURE_COOKIES = os.getenv("SECURE_COOKIES", "false").lower() == "true"
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plain password against a hashed password.
+    The hash computation runs in a worker thread so it doesn't block the event loop.
     
     Args:
         plain_password: The plain text password
@@ -48,12 +174,31 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         True if password matches, False otherwise
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await anyio.to_thread.run_sync(
+        _verify, plain_password, hashed_password, limiter=_hash_limiter
+    )
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verify a password and, if the stored hash uses a deprecated scheme (bcrypt)
+    or outdated parameters, return a fresh Argon2id hash of it.
+    
+    Args:
+        plain_password: The plain text password
+        hashed_password: The hashed password from database
+        
+    Returns:
+        (matches, new_hash) where new_hash is None if no rehash is needed
+    """
+    return await anyio.to_thread.run_sync(
+        _verify_and_update, plain_password, hashed_password, limiter=_hash_limiter
+    )
 
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using Argon2id.
     
     Args:
         password: The plain text password to hash
@@ -61,7 +206,7 @@ def get_password_hash(password: str) -> str:
     Returns:
         The hashed password
     """
-    return pwd_context.hash(password)
+    return await anyio.to_thread.run_sync(_password_hasher.hash, password, limiter=_hash_limiter)
 
 
 def create_token(data: dict, expires_delta: timedelta | None = None) -> str:
@@ -69,48 +214,198 @@ def create_token(data: dict, expires_delta: timedelta | None = None) -> str:
     Create a JWT token (Access or Refresh) with a unique JTI.
     """
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    # exp como epoch entero: evita construir un datetime solo para volver a serializarlo
+    expire_seconds = int(expires_delta.total_seconds()) if expires_delta else ACCESS_TOKEN_EXPIRE_SECONDS
+    expire = int(time.time()) + expire_seconds
     
     # Añadir JTI único para identificación y lista negra
     to_encode.update({
         "exp": expire,
-        "jti": str(uuid.uuid4())
+        "jti": f"{_jti_prefix}{next(_jti_counter):016x}"
     })
     
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return _encode_jwt(to_encode)
+
+
+def _encode_jwt(payload: dict) -> str:
+    """HS256 compact JWS with the pre-encoded header and prepared key."""
+    signing_input = _JWT_HEADER_SEGMENT + b"." + base64url_encode(orjson.dumps(payload))
+    signer = _jwt_hmac_template.copy()
+    signer.update(signing_input)
+    signature = signer.digest()
+    return (signing_input + b"." + base64url_encode(signature)).decode("ascii")
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Helper to create an access token."""
-    token_data = data.copy()
-    token_data.update({"type": "access"})
-    return create_token(token_data, expires_delta=expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    return create_token({**data, "type": "access"}, expires_delta=expires_delta)
+
+
+_REFRESH_TOKEN_EXPIRE_DELTA = timedelta(seconds=REFRESH_TOKEN_EXPIRE_SECONDS)
 
 
 def create_refresh_token(data: dict) -> str:
     """Helper to create a refresh token (7 days)."""
-    token_data = data.copy()
-    token_data.update({"type": "refresh"})
-    return create_token(token_data, expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    return create_token({**data, "type": "refresh"}, expires_delta=_REFRESH_TOKEN_EXPIRE_DELTA)
+
+
+def create_token_pair(user: Any) -> tuple[str, str]:
+    """Create the (access, refresh) token pair for a user from a single set of claims."""
+    claims = {"sub": user.email, "user_id": str(user.id)}
+    return create_access_token(claims), create_refresh_token(claims)
+
+
+async def _build_blacklist_bloom(client: Any) -> Bloom:
+    """Build a fresh Bloom filter from the JTIs currently blacklisted in Redis."""
+    bloom = Bloom(BLACKLIST_BLOOM_CAPACITY, BLACKLIST_BLOOM_ERROR_RATE)
+    async for key in client.scan_iter(match="blacklist:*", count=1000):
+        bloom.add(key.removeprefix("blacklist:"))
+    return bloom
+
+
+async def _blacklist_sync_worker() -> None:
+    """
+    Seed the local Bloom filter with the JTIs already blacklisted in Redis,
+    keep it in sync with the ones added by other workers and periodically
+    replace it with a fresh one so expired JTIs stop counting.
+    """
+    global _blacklist_bloom, _blacklist_bloom_ready
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            async with redis_session() as client:
+                pubsub = client.pubsub()
+                try:
+                    # Subscribe before scanning so no addition is missed in between:
+                    # messages published during the scan are applied to the new filter
+                    await pubsub.subscribe(BLACKLIST_CHANNEL)
+                    while True:
+                        _blacklist_bloom = await _build_blacklist_bloom(client)
+                        _blacklist_bloom_ready = True
+                        
+                        rebuild_at = loop.time() + BLACKLIST_BLOOM_REBUILD_SECONDS
+                        while (remaining := rebuild_at - loop.time()) > 0:
+                            message = await pubsub.get_message(
+                                ignore_subscribe_messages=True, timeout=remaining
+                            )
+                            if message is not None and message["type"] == "message":
+                                _blacklist_bloom.add(message["data"])
+                finally:
+                    _blacklist_bloom_ready = False
+                    await pubsub.reset()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Blacklist sync error, retrying")
+            await asyncio.sleep(1)
+
+
+async def start_blacklist_sync() -> None:
+    """Start the background task that keeps the blacklist Bloom filter in sync."""
+    global _blacklist_sync_task
+    if _blacklist_sync_task is None:
+        _blacklist_sync_task = asyncio.create_task(_blacklist_sync_worker())
+
+
+async def stop_blacklist_sync() -> None:
+    """Stop the blacklist sync task."""
+    global _blacklist_sync_task
+    if _blacklist_sync_task is None:
+        return
+    _blacklist_sync_task.cancel()
+    try:
+        await _blacklist_sync_task
+    except asyncio.CancelledError:
+        pass
+    _blacklist_sync_task = None
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decode and verify a JWT, reusing the payload of tokens already verified
+    by this process.
+    
+    Raises:
+        JWTError: If the token is invalid or expired
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _token_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+    
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp"]})
+    _token_cache[key] = payload
+    return payload
 
 
 async def add_token_to_blacklist(redis_client: Any, jti: str, expire_seconds: int):
-    """Añade un token JTI a la lista negra en Redis."""
-    await redis_client.setex(f"blacklist:{jti}", expire_seconds, "true")
+    """Añade un token JTI a la lista negra en Redis y lo notifica al resto de workers."""
+    await add_tokens_to_blacklist(redis_client, [(jti, expire_seconds)])
+
+
+async def add_tokens_to_blacklist(redis_client: Any, entries: list[tuple[str, int]]):
+    """Añade varios JTI (jti, segundos de expiración) a la lista negra en un solo envío a Redis."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for jti, expire_seconds in entries:
+            _blacklist_bloom.add(jti)
+            _blacklist_cache[jti] = True
+            pipe.setex(f"blacklist:{jti}", expire_seconds, "true")
+            pipe.publish(BLACKLIST_CHANNEL, jti)
+        await pipe.execute()
+
+
+async def revoke_token_once(redis_client: Any, jti: str, expire_seconds: int) -> bool:
+    """
+    Comprueba y añade un JTI a la lista negra en un único round-trip (SET NX).
+    Devuelve False si el token ya estaba revocado (p.ej. un refresh token reutilizado).
+    """
+    if _local_blacklist_status(jti):
+        return False
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(f"blacklist:{jti}", "true", ex=expire_seconds, nx=True)
+        pipe.publish(BLACKLIST_CHANNEL, jti)
+        created, _ = await pipe.execute()
+    _blacklist_bloom.add(jti)
+    _blacklist_cache[jti] = True
+    return bool(created)
+
+
+def _local_blacklist_status(jti: str) -> bool | None:
+    """
+    Resuelve el estado de un JTI sin ir a Redis (filtro Bloom y caché en memoria).
+    Devuelve None si hay que consultarlo en Redis.
+    """
+    # The cache goes first: a JTI revoked here while the filter is being
+    # rebuilt may not be in the new filter until its pub/sub message arrives
+    cached = _blacklist_cache.get(jti)
+    if cached is not None:
+        return cached
+    if _blacklist_bloom_ready and jti not in _blacklist_bloom:
+        return False
+    return None
 
 
 async def is_token_blacklisted(redis_client: Any, jti: str) -> bool:
-    """Comprueba si un token JTI está en la lista negra."""
-    return await redis_client.get(f"blacklist:{jti}") is not None
+    """
+    Comprueba si un token JTI está en la lista negra.
+    El resultado se cachea en memoria durante BLACKLIST_CACHE_TTL_SECONDS.
+    """
+    cached = _local_blacklist_status(jti)
+    if cached is not None:
+        return cached
+    
+    blacklisted = await redis_client.get(f"blacklist:{jti}") is not None
+    _blacklist_cache[jti] = blacklisted
+    return blacklisted
 
 
 OAUTH_STATE_EXPIRE_SECONDS = 600  # 10 minutos
 
 
 async def store_oauth_state(redis_client: Any, state: str, provider: str):
-    """Guarda el estado de OAuth en Redis con una expiración."""
-    await redis_client.setex(
-        f"oauth_state:{state}", OAUTH_STATE_EXPIRE_SECONDS, provider
+    """Guarda el estado de OAuth en Redis con una expiración (NX: nunca sobrescribe uno existente)."""
+    await redis_client.set(
+        f"oauth_state:{state}", provider, ex=OAUTH_STATE_EXPIRE_SECONDS, nx=True
     )
 
 
@@ -119,37 +414,84 @@ async def consume_oauth_state(redis_client: Any, state: str) -> str | None:
     Verifica y consume (elimina) el estado de OAuth de Redis.
     Devuelve el proveedor si el estado es válido, si no, None.
     """
-    key = f"oauth_state:{state}"
-    
-    # Usamos una transacción de Redis (pipeline) para garantizar la atomicidad.
-    async with redis_client.pipeline(transaction=True) as pipe:
-        pipe.get(key)
-        pipe.delete(key)
-        results = await pipe.execute()
+    # GETDEL (Redis >= 6.2) lee y borra de forma atómica en un único comando
+    return await redis_client.getdel(f"oauth_state:{state}")
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Row | None:
+    """
+    Retrieve the credentials projection of a user by email address.
     
-    # El resultado de GET es el primer elemento de la lista de resultados
-    provider = results[0]
-    return provider
+    Args:
+        db: Database session
+        email: User's email address
+        
+    Returns:
+        Row with id, email, hashed_password and is_active if found, None otherwise
+    """
+    # Only the columns login and membership lookups use (no profile_picture or
+    # timestamps, no ORM instance); lambda_stmt caches the compiled SQL and only
+    # the email is bound per call
+    result = await db.execute(
+        lambda_stmt(
+            lambda: select(User.id, User.email, User.hashed_password, User.is_active)
+            .where(User.email == email)
+        )
+    )
+    return result.one_or_none()
+
+
+_CACHED_USER_COLUMNS = tuple(getattr(User, name) for name in CachedUser.model_fields)
 
 
-async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+def user_cache_key(email: str) -> str:
+    """Redis key for the cached user projection."""
+    return f"user:email:{email}"
+
+
+async def get_cached_user_by_email(db: AsyncSession, redis_client: Any, email: str) -> CachedUser | None:
     """
-    Retrieve a user by email address.
+    Retrieve the user projection used for authentication, reading from Redis first.
+    On a cache miss the user is loaded from the database and cached for
+    USER_CACHE_TTL_SECONDS.
     
     Args:
         db: Database session
+        redis_client: Redis client
         email: User's email address
         
     Returns:
-        User object if found, None otherwise
+        CachedUser if found, None otherwise
     """
+    cached = await redis_client.get(user_cache_key(email))
+    if cached is not None:
+        return CachedUser.model_validate_json(cached)
+    
+    return await _load_and_cache_user(db, redis_client, email)
+
+
+async def _load_and_cache_user(db: AsyncSession, redis_client: Any, email: str) -> CachedUser | None:
+    """Load the user projection from the database and store it in Redis."""
+    # Only the CachedUser columns: no password hash, no ORM hydration
     result = await db.execute(
-        select(User).where(User.email == email)
+        lambda_stmt(lambda: select(*_CACHED_USER_COLUMNS).where(User.email == email))
     )
-    return result.scalar_one_or_none()
+    row = result.mappings().first()
+    if row is None:
+        return None
+    
+    cached_user = CachedUser.model_validate(row)
+    await redis_client.setex(user_cache_key(email), USER_CACHE_TTL_SECONDS, cached_user.model_dump_json())
+    return cached_user
+
 
+async def invalidate_cached_user(redis_client: Any, email: str):
+    """Drop the cached user projection after the user row changes."""
+    _user_cache.pop(email, None)
+    await redis_client.delete(user_cache_key(email))
 
-async def authenticate_user(db: AsyncSession, email: str, password: str) -> User | None:
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Row | None:
     """
     Authenticate a user with email and password.
     
@@ -159,15 +501,32 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> User
         password: Plain text password
         
     Returns:
-        User object if authentication successful, None otherwise
+        User row (id, email, hashed_password, is_active) if authentication successful, None otherwise
     """
     user = await get_user_by_email(db, email)
     
-    if not user:
+    # Always run one full hash verification: unknown emails and OAuth-only
+    # accounts (no password hash) check against the dummy hash, so response
+    # time doesn't reveal whether or how an account exists
+    has_password = user is not None and bool(user.hashed_password)
+    verified, new_hash = await verify_and_update_password(
+        password, user.hashed_password if has_password else _DUMMY_HASH
+    )
+    if not has_password or not verified:
         return None
     
-    if not verify_password(password, user.hashed_password):
-        return None
+    if new_hash is not None:
+        # Legacy bcrypt (or outdated Argon2 parameters): store the upgraded hash.
+        # `user` is a plain Row, so rolling back a failed update leaves it intact
+        # and the login itself still succeeds
+        try:
+            await db.execute(
+                update(User).where(User.id == user.id).values(hashed_password=new_hash)
+            )
+            await db.commit()
+        except Exception:
+            logger.exception("Error rehashing password for user %s", user.id)
+            await db.rollback()
     
     return user
 
@@ -186,7 +545,8 @@ async def get_current_user(
         redis: Redis client
         
     Returns:
-        Current authenticated user
+        Current authenticated user as a CachedUser (not an ORM instance;
+        load the User row explicitly when it has to be modified)
         
     Raises:
         HTTPException: If token is invalid or user not found
@@ -198,30 +558,50 @@ async def get_current_user(
     )
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str | None = payload.get("sub")
         jti: str | None = payload.get("jti")
         
         if email is None or payload.get("type") != "access":
             raise credentials_exception
         
-        # Comprobar si el token ha sido invalidado en Redis
-        if jti and await is_token_blacklisted(redis, jti):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token has been revoked",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
         token_data = TokenData(email=email)
         
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_email(db, email=token_data.email)
+    # Comprobar si el token ha sido invalidado y leer el usuario cacheado.
+    # Con la lista negra y el usuario resueltos en memoria no se va a Redis;
+    # si no, las claves que falten se leen en un único comando (MGET).
+    user_key = user_cache_key(token_data.email)
+    user = _user_cache.get(token_data.email)
+    cached = None
+    blacklisted = _local_blacklist_status(jti) if jti else False
+    if blacklisted is None:
+        if user is None:
+            blacklist_value, cached = await redis.mget(f"blacklist:{jti}", user_key)
+        else:
+            blacklist_value = await redis.get(f"blacklist:{jti}")
+        blacklisted = blacklist_value is not None
+        _blacklist_cache[jti] = blacklisted
+    elif not blacklisted and user is None:
+        cached = await redis.get(user_key)
+    
+    if blacklisted:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if user is None:
-        raise credentials_exception
+        if cached is not None:
+            user = CachedUser.model_validate_json(cached)
+        else:
+            user = await _load_and_cache_user(db, redis, token_data.email)
+        if user is None:
+            raise credentials_exception
+        _user_cache[token_data.email] = user
     
     return user
 
@@ -0,0 +1,39 @@
+import httpx
+
+# Cliente HTTP compartido para las llamadas salientes (proveedores OAuth).
+# Reutiliza conexiones keep-alive en lugar de abrir TCP/TLS en cada petición,
+# y con HTTP/2 multiplexa peticiones concurrentes sobre una misma conexión.
+HTTP_TIMEOUT = httpx.Timeout(5.0, connect=2.0, read=4.0)
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=50, max_connections=200)
+# Solo reintenta errores de conexión (ConnectError/ConnectTimeout), nunca
+# respuestas 4xx/5xx ni peticiones que ya llegaron al proveedor
+HTTP_CONNECT_RETRIES = 1
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve el cliente compartido, creándolo si aún no existe."""
+    global _client
+    if _client is None or _client.is_closed:
+        # Con transport explícito, http2 y limits se configuran en el transporte
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True, limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES
+            ),
+        )
+    return _client
+
+
+async def startup_http_client():
+    """Crea el cliente compartido (lifespan de la aplicación)."""
+    get_http_client()
+
+
+async def shutdown_http_client():
+    """Cierra el cliente compartido y sus conexiones."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,100 @@
+"""
+Fixed-size SIEVE cache for verified JWT payloads.
+
+SIEVE keeps a FIFO queue plus one "visited" bit per entry. Hits only set the
+bit (no list reordering, unlike LRU); on eviction a hand walks from the oldest
+entry towards the newest, clearing visited bits and evicting the first entry
+that wasn't hit since the hand last passed it. One-off tokens (e.g. a scan of
+forged or expired tokens) are evicted quickly without flushing the hot ones.
+
+Only used from the event loop thread and no method awaits, so no locking is needed.
+"""
+from typing import Any, Hashable
+
+
+class _Node:
+    __slots__ = ("key", "value", "visited", "newer", "older")
+
+    def __init__(self, key: Hashable, value: Any):
+        self.key = key
+        self.value = value
+        self.visited = False
+        self.newer: "_Node | None" = None
+        self.older: "_Node | None" = None
+
+
+class SieveCache:
+    """Mapping-like cache bounded to `maxsize` entries with SIEVE eviction."""
+
+    def __init__(self, maxsize: int):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._map: dict[Hashable, _Node] = {}
+        self._newest: _Node | None = None
+        self._oldest: _Node | None = None
+        self._hand: _Node | None = None
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._map
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        node = self._map.get(key)
+        if node is None:
+            return default
+        node.visited = True
+        return node.value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        node = self._map.get(key)
+        if node is not None:
+            node.value = value
+            node.visited = True
+            return
+
+        if len(self._map) >= self.maxsize:
+            self._evict()
+
+        node = _Node(key, value)
+        node.older = self._newest
+        if self._newest is not None:
+            self._newest.newer = node
+        self._newest = node
+        if self._oldest is None:
+            self._oldest = node
+        self._map[key] = node
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        node = self._map.get(key)
+        if node is None:
+            return default
+        if self._hand is node:
+            self._hand = node.newer
+        self._unlink(node)
+        return node.value
+
+    def clear(self) -> None:
+        self._map.clear()
+        self._newest = self._oldest = self._hand = None
+
+    def _evict(self) -> None:
+        node = self._hand or self._oldest
+        while node.visited:
+            node.visited = False
+            node = node.newer or self._oldest
+        self._hand = node.newer
+        self._unlink(node)
+
+    def _unlink(self, node: _Node) -> None:
+        if node.newer is not None:
+            node.newer.older = node.older
+        else:
+            self._newest = node.older
+        if node.older is not None:
+            node.older.newer = node.newer
+        else:
+            self._oldest = node.newer
+        del self._map[node.key]
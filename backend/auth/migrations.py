@@ -0,0 +1,339 @@
+"""
+Versioned schema migrations for existing PostgreSQL databases.
+
+init.sql only runs when the Postgres data directory is empty, and
+Base.metadata.create_all never alters tables that already exist, so schema
+changes for databases created by older versions live here. Each migration has
+a version number, runs once and is recorded in the schema_migrations table.
+Every step checks the catalog before changing anything, so on a fresh database
+they are no-ops that only get recorded.
+
+Migrations run at application startup (see the lifespan in backend/main.py)
+under a Postgres advisory lock: with several uvicorn workers only one applies
+them while the others wait. They can also be applied offline, before the new
+version is deployed:
+
+    python -m backend.auth.migrations
+"""
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Tuple
+import asyncio
+import logging
+import os
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .models import AuditLog
+from .database import engine
+from .audit_utils import ensure_audit_partitions
+
+logger = logging.getLogger(__name__)
+
+# Run pending migrations in the lifespan; disable when they are applied offline
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+# Heap pages of the old audit_logs table moved per transaction (8 KiB each)
+AUDIT_MIGRATION_BATCH_PAGES = int(os.getenv("AUDIT_MIGRATION_BATCH_PAGES", "1000"))
+
+# Arbitrary key for pg_advisory_lock, shared by every worker
+MIGRATIONS_LOCK_ID = 7_240_531
+
+_CREATE_MIGRATIONS_TABLE = text("""
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+""")
+
+# Lenient text -> INET cast: values such as 'unknown' become NULL. It lives in
+# pg_temp, so it only exists for the migration connection's session.
+_CREATE_TRY_INET = text("""
+CREATE OR REPLACE FUNCTION pg_temp.try_inet(value TEXT) RETURNS INET AS $$
+BEGIN
+    RETURN value::inet;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE
+""")
+
+Migration = Callable[[AsyncConnection], Awaitable[None]]
+
+
+def _sql(*statements: str) -> Migration:
+    """Migration made of plain SQL statements run in a single transaction."""
+    async def migrate(conn: AsyncConnection) -> None:
+        for statement in statements:
+            await conn.execute(text(statement))
+    return migrate
+
+
+# ============================================================================
+# 1. audit_logs partitioned by month
+# ============================================================================
+
+# Frees the index names of the old table so the partitioned one can reuse them
+_DROP_LEGACY_AUDIT_INDEXES = """
+DO $$
+DECLARE
+    idx record;
+BEGIN
+    ALTER TABLE audit_logs_legacy DROP CONSTRAINT IF EXISTS audit_logs_pkey;
+    FOR idx IN SELECT indexname FROM pg_indexes WHERE tablename = 'audit_logs_legacy' LOOP
+        EXECUTE format('DROP INDEX %I', idx.indexname);
+    END LOOP;
+END $$
+"""
+
+# Moves one range of heap pages; naive timestamps were stored in UTC
+_MOVE_LEGACY_AUDIT_PAGES = """
+WITH moved AS (
+    DELETE FROM audit_logs_legacy
+    WHERE ctid >= '({first},0)'::tid AND ctid < '({last},0)'::tid
+    RETURNING *
+)
+INSERT INTO audit_logs (id, user_id, category, action, resource_type, resource_id, workspace_id,
+                        payload, ip_address, user_agent, success, error_message, created_at)
+SELECT id, user_id, category::text, action::text, resource_type, resource_id, workspace_id,
+       payload, pg_temp.try_inet(ip_address::text), user_agent, success, error_message, created_at::timestamptz
+FROM moved
+"""
+
+
+async def _partition_audit_logs(conn: AsyncConnection) -> None:
+    """
+    Replace a plain audit_logs table with the partitioned one.
+
+    The old table is renamed to audit_logs_legacy and its rows are moved in
+    batches of AUDIT_MIGRATION_BATCH_PAGES heap pages, each in its own short
+    transaction, so neither table stays locked for the whole copy. Moved rows
+    are deleted from audit_logs_legacy in the same transaction, so an
+    interrupted run resumes where it stopped.
+    """
+    relkind = await conn.scalar(text(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass('audit_logs')"
+    ))
+    if relkind == "r":
+        await conn.execute(text("ALTER TABLE audit_logs RENAME TO audit_logs_legacy"))
+        await conn.execute(text(_DROP_LEGACY_AUDIT_INDEXES))
+        await conn.run_sync(AuditLog.__table__.create, checkfirst=True)
+    await conn.commit()
+
+    if not await conn.scalar(text("SELECT to_regclass('audit_logs_legacy') IS NOT NULL")):
+        return
+
+    # Monthly partitions for the old rows, so they don't land in audit_logs_default
+    oldest = await conn.scalar(text("SELECT min(created_at) FROM audit_logs_legacy"))
+    if oldest is not None:
+        if oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        await ensure_audit_partitions(since=oldest)
+
+    pages = await conn.scalar(text(
+        "SELECT pg_relation_size('audit_logs_legacy') / current_setting('block_size')::int"
+    ))
+    await conn.commit()
+
+    moved = 0
+    for first in range(0, pages, AUDIT_MIGRATION_BATCH_PAGES):
+        await conn.execute(text("SELECT set_config('TimeZone', 'UTC', true)"))
+        result = await conn.execute(text(_MOVE_LEGACY_AUDIT_PAGES.format(
+            first=first, last=first + AUDIT_MIGRATION_BATCH_PAGES,
+        )))
+        await conn.commit()
+        moved += result.rowcount
+        logger.info("Moved %d audit logs to the partitioned table (%d/%d pages)", moved, first, pages)
+
+    await conn.execute(text("DROP TABLE audit_logs_legacy"))
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+_AUDIT_CATEGORY_CHECK = "category IN ('AUTH', 'WORKSPACE', 'TENDER', 'DOCUMENT', 'SYSTEM', 'N8N', 'CHATBOT')"
+_AUDIT_ACTION_CHECK = """action IN (
+    'LOGIN_SUCCESS', 'LOGIN_FAILED', 'LOGOUT', 'PASSWORD_CHANGE', 'OAUTH_LOGIN', 'USER_VIEW', 'USER_UPDATE', 'USER_DELETE',
+    'WORKSPACE_CREATE', 'WORKSPACE_UPDATE', 'WORKSPACE_DELETE', 'MEMBER_ADD', 'MEMBER_REMOVE', 'ROLE_CHANGE',
+    'TENDER_CREATE', 'TENDER_UPDATE', 'TENDER_DELETE', 'TENDER_VIEW', 'TENDER_ANALYZE',
+    'DOCUMENT_UPLOAD', 'DOCUMENT_DELETE', 'DOCUMENT_EXTRACT',
+    'SYSTEM_ERROR', 'SYSTEM_BACKUP',
+    'AUTOMATION_CREATE', 'AUTOMATION_UPDATE', 'AUTOMATION_DELETE',
+    'WORKFLOW_START', 'WORKFLOW_COMPLETE', 'WORKFLOW_ERROR',
+    'CHATBOT_QUESTION'
+)"""
+
+# (version, name, migration), applied in order. Never renumber or edit an
+# entry that has shipped; add a new one instead.
+MIGRATIONS: List[Tuple[int, str, Migration]] = [
+    (1, "partition_audit_logs", _partition_audit_logs),
+    (2, "timestamptz", _sql("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'users' AND column_name = 'created_at'
+                         AND data_type = 'timestamp without time zone') THEN
+                ALTER TABLE users
+                    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC',
+                    ALTER COLUMN updated_at TYPE TIMESTAMPTZ USING updated_at AT TIME ZONE 'UTC';
+            END IF;
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'audit_logs' AND column_name = 'created_at'
+                         AND data_type = 'timestamp without time zone') THEN
+                ALTER TABLE audit_logs
+                    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC';
+            END IF;
+        END $$
+    """)),
+    (3, "audit_enums_to_varchar", _sql(f"""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'audit_logs' AND column_name = 'category'
+                         AND data_type = 'USER-DEFINED') THEN
+                ALTER TABLE audit_logs
+                    ALTER COLUMN category TYPE VARCHAR(32) USING category::text,
+                    ALTER COLUMN action TYPE VARCHAR(32) USING action::text;
+                ALTER TABLE audit_logs
+                    ADD CONSTRAINT ck_audit_category CHECK ({_AUDIT_CATEGORY_CHECK}),
+                    ADD CONSTRAINT ck_audit_action CHECK ({_AUDIT_ACTION_CHECK});
+            END IF;
+        END $$
+    """, "DROP TYPE IF EXISTS auditcategory", "DROP TYPE IF EXISTS auditaction")),
+    (4, "audit_payload_jsonb_path_ops", _sql("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_index i
+                       JOIN pg_class c ON c.oid = i.indexrelid
+                       JOIN pg_opclass o ON o.oid = i.indclass[0]
+                       WHERE c.relname = 'ix_audit_payload' AND o.opcname = 'jsonb_ops') THEN
+                DROP INDEX ix_audit_payload;
+                CREATE INDEX ix_audit_payload ON audit_logs USING GIN (payload jsonb_path_ops);
+            END IF;
+        END $$
+    """)),
+    (5, "audit_index_created_at_desc", _sql("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_indexes
+                       WHERE indexname = 'ix_audit_category_action' AND indexdef NOT LIKE '%created_at DESC%') THEN
+                DROP INDEX ix_audit_category_action;
+                CREATE INDEX ix_audit_category_action ON audit_logs (category, action, created_at DESC);
+            END IF;
+            IF EXISTS (SELECT 1 FROM pg_indexes
+                       WHERE indexname = 'ix_audit_failures' AND indexdef NOT LIKE '%(created_at DESC)%') THEN
+                DROP INDEX ix_audit_failures;
+                CREATE INDEX ix_audit_failures ON audit_logs (created_at DESC) WHERE success = FALSE;
+            END IF;
+        END $$
+    """)),
+    # Single-column indexes covered by composite ones (and the btree replaced
+    # by the BRIN ix_audit_created_brin)
+    (6, "drop_redundant_indexes", _sql(
+        "DROP INDEX IF EXISTS ix_users_id",
+        "DROP INDEX IF EXISTS ix_users_oauth_provider",
+        "DROP INDEX IF EXISTS ix_audit_logs_user_id",
+        "DROP INDEX IF EXISTS ix_audit_logs_category",
+        "DROP INDEX IF EXISTS ix_audit_logs_workspace_id",
+        "DROP INDEX IF EXISTS ix_audit_logs_resource_type",
+        "DROP INDEX IF EXISTS ix_audit_logs_created_at",
+        """
+        DO $$
+        BEGIN
+            -- ix_users_email is only redundant if users_email_key enforces uniqueness
+            IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'users_email_key') THEN
+                DROP INDEX IF EXISTS ix_users_email;
+            END IF;
+        END $$
+        """,
+    )),
+    (7, "audit_user_created_include", _sql("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_indexes
+                       WHERE indexname = 'ix_audit_user_created' AND indexdef NOT LIKE '%INCLUDE%') THEN
+                DROP INDEX ix_audit_user_created;
+                CREATE INDEX ix_audit_user_created ON audit_logs (user_id, created_at DESC)
+                    INCLUDE (id, category, action, workspace_id, resource_type, resource_id, success);
+            END IF;
+        END $$
+    """)),
+    (8, "audit_ip_address_inet", _sql("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = 'audit_logs' AND column_name = 'ip_address'
+                         AND data_type = 'character varying') THEN
+                ALTER TABLE audit_logs
+                    ALTER COLUMN ip_address TYPE INET USING pg_temp.try_inet(ip_address);
+            END IF;
+        END $$
+    """)),
+    (9, "users_email_active_include", _sql("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_indexes
+                       WHERE indexname = 'ix_users_email_active' AND indexdef NOT LIKE '%INCLUDE%') THEN
+                DROP INDEX ix_users_email_active;
+                CREATE INDEX ix_users_email_active ON users (email, is_active) INCLUDE (id, hashed_password);
+            END IF;
+        END $$
+    """)),
+]
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+async def run_migrations() -> List[int]:
+    """
+    Apply the pending migrations in version order.
+
+    Each migration commits together with its schema_migrations row, so a
+    failure leaves the earlier ones recorded and the failed one is retried on
+    the next start.
+
+    Returns:
+        Versions applied by this call
+    """
+    applied_now: List[int] = []
+    async with engine.connect() as conn:
+        # Session-level lock: held across the per-migration commits below
+        await conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+        await conn.commit()
+        try:
+            await conn.execute(_CREATE_MIGRATIONS_TABLE)
+            await conn.execute(_CREATE_TRY_INET)
+            result = await conn.execute(text("SELECT version FROM schema_migrations"))
+            applied = set(result.scalars().all())
+            await conn.commit()
+
+            for version, name, migrate in MIGRATIONS:
+                if version in applied:
+                    continue
+                started = datetime.now(timezone.utc)
+                await migrate(conn)
+                await conn.execute(
+                    text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                    {"version": version, "name": name},
+                )
+                await conn.commit()
+                applied_now.append(version)
+                elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+                logger.info("Applied migration %03d_%s in %.1fs", version, name, elapsed)
+        finally:
+            await conn.rollback()
+            await conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATIONS_LOCK_ID})
+            await conn.commit()
+    return applied_now
+
+
+if __name__ == "__main__":
+    async def _main() -> None:
+        logging.basicConfig(level=logging.INFO)
+        await run_migrations()
+        await engine.dispose()
+
+    asyncio.run(_main())
@@ -5,11 +5,13 @@ Business data (tenders, documents) lives in MongoDB.
 """
 import uuid
 import enum
-from datetime import datetime, timezone
-from sqlalchemy import Column, String, Boolean, DateTime, Index, Text, ForeignKey, Enum
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+import ipaddress
+import orjson
+from sqlalchemy import Column, String, Boolean, DateTime, Index, Text, ForeignKey, Enum, DDL, event, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB, INET
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy.types import TypeDecorator
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -17,6 +19,42 @@ class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
+class OrjsonJSONB(TypeDecorator):
+    """
+    JSONB serializado con orjson.
+    Acepta un dict o bytes ya codificados con orjson.dumps (el productor puede
+    serializar por adelantado); el serializador JSON del engine deja pasar los bytes.
+    La lectura la resuelve el codec JSONB del engine (orjson.loads).
+    """
+    impl = JSONB
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        return orjson.dumps(value)
+
+
+class IPAddress(TypeDecorator):
+    """
+    Dirección IP guardada como INET nativo y expuesta como str.
+    Los valores que no son una IP válida (p.ej. "unknown") se guardan como NULL.
+    """
+    impl = INET
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            return None
+    
+    def process_result_value(self, value, dialect):
+        return str(value) if value is not None else None
+
+
 class User(Base):
     """
     User model for authentication and identity management.
@@ -24,16 +62,16 @@ class User(Base):
     """
     __tablename__ = "users"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True, nullable=False)
-    email = Column(String(255), unique=True, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
+    email = Column(String(255), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=True)  # Nullable for OAuth users
     full_name = Column(String(50),nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
-    oauth_provider = Column(String(50), nullable=True,index=True)
+    oauth_provider = Column(String(50), nullable=True)
     oauth_id = Column(String(255), nullable=True,index=True)
     profile_picture = Column(Text, nullable=True, default="/avatar/blue_lizard.png")
-    created_at = Column(DateTime, default=datetime.utcnow,nullable=False)
-    updated_at = Column(DateTime,default=datetime.utcnow,onupdate=datetime.utcnow,nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     # Relaciones con cascadas explícitas
     owned_workspaces = relationship("Workspace",back_populates="owner",cascade="all, delete-orphan",passive_deletes=True)
@@ -41,9 +79,13 @@ class User(Base):
     audit_logs = relationship("AuditLog",back_populates="user",cascade="all, delete-orphan",passive_deletes=True)
     automations = relationship("Automation", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
 
-    __table_args__ = (Index('ix_users_email_active', 'email', 'is_active'),
+    __table_args__ = (Index('ix_users_email_active', 'email', 'is_active',
+                            postgresql_include=['id', 'hashed_password']),
                       Index('ix_users_oauth_provider_id', 'oauth_provider', 'oauth_id'))
     
+    # Recupera con RETURNING los timestamps generados por Postgres en INSERT/UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+    
     @property
     def is_oauth_user(self) -> bool:
         """Check if user is authenticated via OAuth."""
@@ -141,18 +183,19 @@ class AuditLog(Base):
     user_id = Column(
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="SET NULL"),
-        nullable=True,
-        index=True
+        nullable=True
     )
     
-    # Categoría y acción como enums para consistencia
+    # Categoría y acción como enums de Python guardados en VARCHAR + CHECK
+    # (sin tipos ENUM nativos: añadir valores no requiere ALTER TYPE)
     category = Column(
-        Enum(AuditCategory),
-        nullable=False,
-        index=True
+        Enum(AuditCategory, native_enum=False, create_constraint=True,
+             length=32, name="ck_audit_category"),
+        nullable=False
     )
     action = Column(
-        Enum(AuditAction),
+        Enum(AuditAction, native_enum=False, create_constraint=True,
+             length=32, name="ck_audit_action"),
         nullable=False,
         index=True
     )
@@ -160,8 +203,7 @@ class AuditLog(Base):
     # Información del recurso afectado
     resource_type = Column(
         String(50),
-        nullable=True,
-        index=True
+        nullable=True
     )
     resource_id = Column(
         String(255),
@@ -172,19 +214,18 @@ class AuditLog(Base):
     # Referencia a workspace para filtrado rápido
     workspace_id = Column(
         UUID(as_uuid=True),
-        nullable=True,
-        index=True
+        nullable=True
     )
     
     # Payload con datos detallados (JSONB permite consultas eficientes)
     payload = Column(
-        JSONB,
+        OrjsonJSONB,
         nullable=True
     )
     
     # Contexto técnico
     ip_address = Column(
-        String(45),  # IPv6 compatible
+        IPAddress,  # INET: 7 bytes IPv4 / 19 bytes IPv6
         nullable=True
     )
     user_agent = Column(
@@ -203,41 +244,75 @@ class AuditLog(Base):
         nullable=True
     )
     
+    # Forma parte de la clave primaria porque es la clave de partición
     created_at = Column(
-        DateTime,
-        default=datetime.utcnow,
-        nullable=False,
-        index=True
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+        nullable=False
     )
 
     # Relación
     user = relationship("User", back_populates="audit_logs")
     
-    # Índices compuestos para consultas comunes
+    # Índices compuestos para consultas comunes. user_id, category, workspace_id y
+    # resource_type no llevan índice propio porque encabezan alguno de estos.
+    # created_at va en orden descendente para servir "ORDER BY created_at DESC LIMIT N"
+    # directamente desde el índice, sin nodo Sort.
     __table_args__ = (
-        # Auditoría por usuario
-        Index('ix_audit_user_created', 'user_id', 'created_at'),
+        # Auditoría por usuario. INCLUDE lleva el resto de columnas que lee
+        # get_user_activity para que pueda resolverse con index-only scan
+        Index('ix_audit_user_created', user_id, created_at.desc(),
+              postgresql_include=['id', 'category', 'action', 'workspace_id',
+                                  'resource_type', 'resource_id', 'success']),
         
         # Auditoría por categoría y acción
-        Index('ix_audit_category_action', 'category', 'action', 'created_at'),
+        Index('ix_audit_category_action', category, action, created_at.desc()),
         
         # Auditoría por workspace
-        Index('ix_audit_workspace_created', 'workspace_id', 'created_at'),
+        Index('ix_audit_workspace_created', workspace_id, created_at.desc()),
         
         # Auditoría por recurso
-        Index('ix_audit_resource', 'resource_type', 'resource_id'),
+        Index('ix_audit_resource', resource_type, resource_id, created_at.desc()),
         
         # Eventos fallidos
-        Index('ix_audit_failures', 'success', 'created_at', postgresql_where=(Column('success') == False)),
+        # Parcial sobre success = false: success no aporta nada dentro del índice
+        Index('ix_audit_failures', created_at.desc(), postgresql_where=(success == False)),
+        Index('ix_audit_failed', success, category, created_at.desc()),
+        
+        # Detección de actividad sospechosa (fallos por categoría e IP)
+        Index('ix_audit_suspicious', category, ip_address, created_at, postgresql_where=(success == False)),
+        
+        # Rangos amplios de fechas (informes, retención): BRIN en lugar de btree.
+        # La tabla es append-only y created_at sigue el orden de inserción, así que
+        # el resumen min/max por bloque es muy selectivo y el índice ocupa muy poco
+        Index('ix_audit_created_brin', created_at, postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
         
-        # Índice GIN para búsqueda en JSONB
-        Index('ix_audit_payload', 'payload', postgresql_using='gin'),
+        # Índice GIN para búsqueda en JSONB con jsonb_path_ops: más pequeño y rápido,
+        # pero solo sirve para contención (payload @> '{...}'); filtros con -> / ->>
+        # o con ? / ?| no lo usan
+        Index('ix_audit_payload', 'payload', postgresql_using='gin',
+              postgresql_ops={'payload': 'jsonb_path_ops'}),
+        
+        # Tabla particionada por mes (ver ensure_audit_partitions en audit_utils)
+        {'postgresql_partition_by': 'RANGE (created_at)'},
     )
+    
+    __mapper_args__ = {"eager_defaults": True}
 
     def __repr__(self) -> str:
         return f"<AuditLog(id={self.id}, category={self.category}, action={self.action}, user_id={self.user_id})>"
 
 
+# Partición por defecto: recoge las filas fuera de las particiones mensuales creadas
+event.listen(
+    AuditLog.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT")
+)
+
+
 # ============================================================================
 # EJEMPLOS DE ESTRUCTURA DE PAYLOAD PARA AUDIT_LOG
 # ============================================================================
@@ -2,9 +2,12 @@
 OAuth2 configuration for third-party authentication providers.
 Supports Google, Facebook, GitHub, and Microsoft.
 """
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Any, List, Mapping
 import os
 
+_EMPTY_CONFIG: Mapping[str, Any] = MappingProxyType({})
+
 
 class OAuthConfig:
     """Configuration for OAuth2 providers."""
@@ -16,7 +19,7 @@ class OAuthConfig:
     GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
     GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
     GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
-    GOOGLE_SCOPES = ["openid", "email", "profile"]
+    GOOGLE_SCOPES = ("openid", "email", "profile")
     
     # Facebook OAuth2
     FACEBOOK_CLIENT_ID = os.getenv("FACEBOOK_CLIENT_ID", "")
@@ -25,7 +28,7 @@ class OAuthConfig:
     FACEBOOK_AUTH_URL = "https://www.facebook.com/v18.0/dialog/oauth"
     FACEBOOK_TOKEN_URL = "https://graph.facebook.com/v18.0/oauth/access_token"
     FACEBOOK_USERINFO_URL = "https://graph.facebook.com/me"
-    FACEBOOK_SCOPES = ["email", "public_profile"]
+    FACEBOOK_SCOPES = ("email", "public_profile")
     
     # GitHub OAuth2
     GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID", "")
@@ -35,7 +38,9 @@ class OAuthConfig:
     GITHUB_TOKEN_URL = "https://github.com/login/oauth/access_token"
     GITHUB_USERINFO_URL = "https://api.github.com/user"
     GITHUB_EMAIL_URL = "https://api.github.com/user/emails"
-    GITHUB_SCOPES = ["user:email"]
+    GITHUB_SCOPES = ("user:email",)
+    # Pedir perfil y emails en paralelo (una petición extra a la API si el perfil ya trae email)
+    GITHUB_SPECULATIVE_EMAIL_FETCH = os.getenv("GITHUB_SPECULATIVE_EMAIL_FETCH", "true").lower() == "true"
     
     # Microsoft OAuth2
     MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID", "")
@@ -45,58 +50,63 @@ class OAuthConfig:
     MICROSOFT_AUTH_URL = f"https://login.microsoftonline.com/{MICROSOFT_TENANT}/oauth2/v2.0/authorize"
     MICROSOFT_TOKEN_URL = f"https://login.microsoftonline.com/{MICROSOFT_TENANT}/oauth2/v2.0/token"
     MICROSOFT_USERINFO_URL = "https://graph.microsoft.com/v1.0/me"
-    MICROSOFT_SCOPES = ["openid", "email", "profile"]
+    MICROSOFT_SCOPES = ("openid", "email", "profile")
+    
+    # Configuración por proveedor, construida una sola vez al cargar la clase
+    _PROVIDERS = {
+        "google": MappingProxyType({
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "redirect_uri": GOOGLE_REDIRECT_URI,
+            "auth_url": GOOGLE_AUTH_URL,
+            "token_url": GOOGLE_TOKEN_URL,
+            "userinfo_url": GOOGLE_USERINFO_URL,
+            "scopes": GOOGLE_SCOPES,
+        }),
+        "facebook": MappingProxyType({
+            "client_id": FACEBOOK_CLIENT_ID,
+            "client_secret": FACEBOOK_CLIENT_SECRET,
+            "redirect_uri": FACEBOOK_REDIRECT_URI,
+            "auth_url": FACEBOOK_AUTH_URL,
+            "token_url": FACEBOOK_TOKEN_URL,
+            "userinfo_url": FACEBOOK_USERINFO_URL,
+            "scopes": FACEBOOK_SCOPES,
+        }),
+        "github": MappingProxyType({
+            "client_id": GITHUB_CLIENT_ID,
+            "client_secret": GITHUB_CLIENT_SECRET,
+            "redirect_uri": GITHUB_REDIRECT_URI,
+            "auth_url": GITHUB_AUTH_URL,
+            "token_url": GITHUB_TOKEN_URL,
+            "userinfo_url": GITHUB_USERINFO_URL,
+            "scopes": GITHUB_SCOPES,
+        }),
+        "microsoft": MappingProxyType({
+            "client_id": MICROSOFT_CLIENT_ID,
+            "client_secret": MICROSOFT_CLIENT_SECRET,
+            "redirect_uri": MICROSOFT_REDIRECT_URI,
+            "auth_url": MICROSOFT_AUTH_URL,
+            "token_url": MICROSOFT_TOKEN_URL,
+            "userinfo_url": MICROSOFT_USERINFO_URL,
+            "scopes": MICROSOFT_SCOPES,
+        }),
+    }
     
     @classmethod
-    def get_provider_config(cls, provider: str) -> Dict[str, str]:
+    def get_provider_config(cls, provider: str) -> Mapping[str, Any]:
         """
         Get configuration for a specific OAuth provider.
         
+        Configs are frozen at class definition and returned as-is (read-only
+        views with tuple scopes), so callers must not try to modify them.
+        
         Args:
             provider: Provider name (google, facebook, github, microsoft)
             
         Returns:
-            Dictionary with provider configuration
+            Read-only mapping with provider configuration (empty if unknown)
         """
-        configs = {
-            "google": {
-                "client_id": cls.GOOGLE_CLIENT_ID,
-                "client_secret": cls.GOOGLE_CLIENT_SECRET,
-                "redirect_uri": cls.GOOGLE_REDIRECT_URI,
-                "auth_url": cls.GOOGLE_AUTH_URL,
-                "token_url": cls.GOOGLE_TOKEN_URL,
-                "userinfo_url": cls.GOOGLE_USERINFO_URL,
-                "scopes": cls.GOOGLE_SCOPES,
-            },
-            "facebook": {
-                "client_id": cls.FACEBOOK_CLIENT_ID,
-                "client_secret": cls.FACEBOOK_CLIENT_SECRET,
-                "redirect_uri": cls.FACEBOOK_REDIRECT_URI,
-                "auth_url": cls.FACEBOOK_AUTH_URL,
-                "token_url": cls.FACEBOOK_TOKEN_URL,
-                "userinfo_url": cls.FACEBOOK_USERINFO_URL,
-                "scopes": cls.FACEBOOK_SCOPES,
-            },
-            "github": {
-                "client_id": cls.GITHUB_CLIENT_ID,
-                "client_secret": cls.GITHUB_CLIENT_SECRET,
-                "redirect_uri": cls.GITHUB_REDIRECT_URI,
-                "auth_url": cls.GITHUB_AUTH_URL,
-                "token_url": cls.GITHUB_TOKEN_URL,
-                "userinfo_url": cls.GITHUB_USERINFO_URL,
-                "scopes": cls.GITHUB_SCOPES,
-            },
-            "microsoft": {
-                "client_id": cls.MICROSOFT_CLIENT_ID,
-                "client_secret": cls.MICROSOFT_CLIENT_SECRET,
-                "redirect_uri": cls.MICROSOFT_REDIRECT_URI,
-                "auth_url": cls.MICROSOFT_AUTH_URL,
-                "token_url": cls.MICROSOFT_TOKEN_URL,
-                "userinfo_url": cls.MICROSOFT_USERINFO_URL,
-                "scopes": cls.MICROSOFT_SCOPES,
-            },
-        }
-        return configs.get(provider, {})
+        return cls._PROVIDERS.get(provider, _EMPTY_CONFIG)
     
     @classmethod
     def get_enabled_providers(cls) -> List[str]:
@@ -104,17 +114,13 @@ class OAuthConfig:
         Get list of enabled OAuth providers (those with credentials configured).
         
         Returns:
-            List of enabled provider names
+            Sorted list of enabled provider names
         """
-        enabled = []
-        
-        if cls.GOOGLE_CLIENT_ID and cls.GOOGLE_CLIENT_SECRET:
-            enabled.append("google")
-        if cls.FACEBOOK_CLIENT_ID and cls.FACEBOOK_CLIENT_SECRET:
-            enabled.append("facebook")
-        if cls.GITHUB_CLIENT_ID and cls.GITHUB_CLIENT_SECRET:
-            enabled.append("github")
-        if cls.MICROSOFT_CLIENT_ID and cls.MICROSOFT_CLIENT_SECRET:
-            enabled.append("microsoft")
-        
-        return enabled
+        return sorted(ENABLED_PROVIDERS)
+
+
+# Providers with credentials configured, resolved once at import
+ENABLED_PROVIDERS: frozenset[str] = frozenset(
+    name for name, config in OAuthConfig._PROVIDERS.items()
+    if config["client_id"] and config["client_secret"]
+)
@@ -1,9 +1,10 @@
 from typing import List, Any
-import httpx
+import asyncio
 from urllib.parse import urlencode
 from fastapi import HTTPException, status
 
 from .oauth_config import OAuthConfig
+from .http_client import get_http_client
 from .schemas import OAuthUserInfo
 
 """
@@ -69,21 +70,21 @@ class OAuthProvider:
         if self.provider == "github":
             headers["Accept"] = "application/json"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                self.config["token_url"],
-                data=data,
-                headers=headers
+        client = get_http_client()
+        response = await client.post(
+            self.config["token_url"],
+            data=data,
+            headers=headers
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Failed to exchange code for token: {response.text}"
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to exchange code for token: {response.text}"
-                )
-            
-            token_data = response.json()
-            return token_data.get("access_token")
+        
+        token_data = response.json()
+        return token_data.get("access_token")
     
     async def get_user_info(self, access_token: str) -> OAuthUserInfo:
         """
@@ -95,74 +96,68 @@ class OAuthProvider:
         Returns:
             User information
         """
-        if self.provider == "google":
-            return await self._get_google_user_info(access_token)
-        elif self.provider == "facebook":
-            return await self._get_facebook_user_info(access_token)
-        elif self.provider == "github":
-            return await self._get_github_user_info(access_token)
-        elif self.provider == "microsoft":
-            return await self._get_microsoft_user_info(access_token)
-        else:
+        handler = self._DISPATCH.get(self.provider)
+        if handler is None:
             raise ValueError(f"Unsupported provider: {self.provider}")
+        return await handler(self, access_token)
     
     async def _get_google_user_info(self, access_token: str) -> OAuthUserInfo:
         """Get user info from Google."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                self.config["userinfo_url"],
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to fetch user info from Google"
-                )
-            
-            data = response.json()
-            
-            return OAuthUserInfo(
-                email=data["email"],
-                full_name=data.get("name", ""),
-                profile_picture=data.get("picture"),
-                oauth_id=data["id"],
-                oauth_provider="google"
+        client = get_http_client()
+        response = await client.get(
+            self.config["userinfo_url"],
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to fetch user info from Google"
             )
+        
+        data = response.json()
+        
+        return OAuthUserInfo(
+            email=data["email"],
+            full_name=data.get("name", ""),
+            profile_picture=data.get("picture"),
+            oauth_id=data["id"],
+            oauth_provider="google"
+        )
     
     async def _get_facebook_user_info(self, access_token: str) -> OAuthUserInfo:
         """Get user info from Facebook."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                self.config["userinfo_url"],
-                params={
-                    "fields": "id,name,email,picture",
-                    "access_token": access_token
-                }
+        client = get_http_client()
+        response = await client.get(
+            self.config["userinfo_url"],
+            params={
+                "fields": "id,name,email,picture",
+                "access_token": access_token
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to fetch user info from Facebook"
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to fetch user info from Facebook"
-                )
-            
-            data = response.json()
-            
-            # Facebook might not always provide email
-            if "email" not in data:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email permission not granted by Facebook"
-                )
-            
-            return OAuthUserInfo(
-                email=data["email"],
-                full_name=data.get("name", ""),
-                profile_picture=data.get("picture", {}).get("data", {}).get("url"),
-                oauth_id=data["id"],
-                oauth_provider="facebook"
+        
+        data = response.json()
+        
+        # Facebook might not always provide email
+        if "email" not in data:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email permission not granted by Facebook"
             )
+        
+        return OAuthUserInfo(
+            email=data["email"],
+            full_name=data.get("name", ""),
+            profile_picture=data.get("picture", {}).get("data", {}).get("url"),
+            oauth_id=data["id"],
+            oauth_provider="facebook"
+        )
     
     async def _get_github_user_info(self, access_token: str) -> OAuthUserInfo:
         """Get user info from GitHub."""
@@ -171,75 +166,96 @@ class OAuthProvider:
             "Accept": "application/json"
         }
         
-        async with httpx.AsyncClient() as client:
+        client = get_http_client()
+        email_response = None
+        if OAuthConfig.GITHUB_SPECULATIVE_EMAIL_FETCH:
+            # Fetch profile and emails concurrently; the emails response is only
+            # used when the profile doesn't expose an email
+            user_response, email_response = await asyncio.gather(
+                client.get(self.config["userinfo_url"], headers=headers),
+                client.get(OAuthConfig.GITHUB_EMAIL_URL, headers=headers),
+                return_exceptions=True
+            )
+            if isinstance(user_response, BaseException):
+                raise user_response
+        else:
             # Get user profile
             user_response = await client.get(
                 self.config["userinfo_url"],
                 headers=headers
             )
-            
-            if user_response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to fetch user info from GitHub"
-                )
-            
-            user_data = user_response.json()
-            
-            # Get primary email (GitHub might not expose email in profile)
-            email = user_data.get("email")
-            
-            if not email:
+        
+        if user_response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to fetch user info from GitHub"
+            )
+        
+        user_data = user_response.json()
+        
+        # Get primary email (GitHub might not expose email in profile)
+        email = user_data.get("email")
+        
+        if not email:
+            if email_response is None:
                 email_response = await client.get(
                     OAuthConfig.GITHUB_EMAIL_URL,
                     headers=headers
                 )
-                
-                if email_response.status_code == 200:
-                    emails = email_response.json()
-                    # Find primary verified email
-                    for email_obj in emails:
-                        if email_obj.get("primary") and email_obj.get("verified"):
-                            email = email_obj["email"]
-                            break
-            
-            if not email:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Unable to retrieve email from GitHub"
-                )
             
-            return OAuthUserInfo(
-                email=email,
-                full_name=user_data.get("name") or user_data.get("login", ""),
-                profile_picture=user_data.get("avatar_url"),
-                oauth_id=str(user_data["id"]),
-                oauth_provider="github"
+            if not isinstance(email_response, BaseException) and email_response.status_code == 200:
+                emails = email_response.json()
+                # Find primary verified email
+                for email_obj in emails:
+                    if email_obj.get("primary") and email_obj.get("verified"):
+                        email = email_obj["email"]
+                        break
+        
+        if not email:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unable to retrieve email from GitHub"
             )
+        
+        return OAuthUserInfo(
+            email=email,
+            full_name=user_data.get("name") or user_data.get("login", ""),
+            profile_picture=user_data.get("avatar_url"),
+            oauth_id=str(user_data["id"]),
+            oauth_provider="github"
+        )
     
     async def _get_microsoft_user_info(self, access_token: str) -> OAuthUserInfo:
         """Get user info from Microsoft."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                self.config["userinfo_url"],
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to fetch user info from Microsoft"
-                )
-            
-            data = response.json()
-            
-            return OAuthUserInfo(
-                email=data["mail"] or data.get("userPrincipalName", ""),
-                full_name=data.get("displayName", ""),
-                profile_picture=None,  # Would need additional Graph API call
-                oauth_id=data["id"],
-                oauth_provider="microsoft"
+        client = get_http_client()
+        response = await client.get(
+            self.config["userinfo_url"],
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to fetch user info from Microsoft"
             )
+        
+        data = response.json()
+        
+        return OAuthUserInfo(
+            email=data["mail"] or data.get("userPrincipalName", ""),
+            full_name=data.get("displayName", ""),
+            profile_picture=None,  # Would need additional Graph API call
+            oauth_id=data["id"],
+            oauth_provider="microsoft"
+        )
+    
+    # Provider name -> user info handler
+    _DISPATCH = {
+        "google": _get_google_user_info,
+        "facebook": _get_facebook_user_info,
+        "github": _get_github_user_info,
+        "microsoft": _get_microsoft_user_info,
+    }
 
 
 async def get_oauth_user(provider: str, code: str) -> OAuthUserInfo:
@@ -255,5 +271,4 @@ async def get_oauth_user(provider: str, code: str) -> OAuthUserInfo:
     """
     oauth = OAuthProvider(provider)
     access_token = await oauth.exchange_code_for_token(code)
-    user_info = await oauth.get_user_info(access_token)
-    return user_info
+    return await oauth.get_user_info(access_token)
@@ -1,26 +1,43 @@
+from contextlib import asynccontextmanager
 import redis.asyncio as redis
 import os
 
+__all__ = ["REDIS_URL", "get_redis_client", "get_redis", "redis_session", "close_redis"]
+
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+# Cliente compartido por todo el proceso: un único pool de conexiones en lugar
+# de crear (y cerrar) uno nuevo en cada petición.
+_client: redis.Redis | None = None
+
+
+def get_redis_client() -> redis.Redis:
+    """Devuelve el cliente compartido, creándolo si aún no existe."""
+    global _client
+    if _client is None:
+        pool = redis.ConnectionPool.from_url(
+            REDIS_URL, decode_responses=True, max_connections=REDIS_MAX_CONNECTIONS
+        )
+        _client = redis.Redis(connection_pool=pool)
+    return _client
+
+
+async def close_redis():
+    """Cierra el cliente compartido y su pool (lifespan de la aplicación)."""
+    global _client
+    if _client is not None:
+        await _client.aclose(close_connection_pool=True)
+        _client = None
+
 
 async def get_redis():
-    """Dependencia para obtener un cliente de Redis con gestión de ciclo de vida."""
-    client = redis.from_url(REDIS_URL, decode_responses=True)
-    try:
-        yield client
-    finally:
-        await client.aclose()
-
-class RedisClientManager:
-    """Para uso fuera de dependencias de FastAPI (ej. inicialización)."""
-    
-    def __init__(self):
-        self.client = None
-    
-    async def __aenter__(self):
-        self.client = redis.from_url(REDIS_URL, decode_responses=True)
-        return self.client
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.client:
-            await self.client.aclose()
+    """Dependencia que devuelve el cliente de Redis compartido."""
+    yield get_redis_client()
+
+
+@asynccontextmanager
+async def redis_session():
+    """Para uso fuera de dependencias de FastAPI (ej. tareas en segundo plano).
+    Devuelve el cliente compartido; no lo cierra al salir (ver close_redis)."""
+    yield get_redis_client()
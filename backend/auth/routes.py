@@ -1,47 +1,61 @@
 from typing import Any, List
+import asyncio
+import logging
 from datetime import timedelta
-import secrets
 import uuid
 import time
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Cookie
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request, Response, Cookie
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, func, bindparam, or_, and_, lambda_stmt
+from sqlalchemy.orm import load_only
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from backend.auth.models import User, AuditAction, AuditCategory
+from backend.workspaces.models import Workspace
 from backend.auth.schemas import UserCreate, UserResponse, Token, UserLogin, OAuthUserInfo, UserUpdate
 from backend.auth.auth_utils import (
     get_password_hash,
     authenticate_user,
-    create_access_token,
-    create_refresh_token,
-    add_token_to_blacklist,
-    is_token_blacklisted,
+    create_token_pair,
+    add_tokens_to_blacklist,
+    revoke_token_once,
+    decode_token,
     get_current_active_user,
-    get_user_by_email,
+    invalidate_cached_user,
     set_refresh_token_cookie,
     store_oauth_state,
     consume_oauth_state,
-    ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS,
-    SECRET_KEY,
-    ALGORITHM,
     oauth2_scheme
 )
-from jose import jwt, JWTError
-from backend.auth.oauth_config import OAuthConfig
+from jwt import PyJWTError
+from backend.auth.oauth_config import ENABLED_PROVIDERS
 from backend.auth.oauth_utils import OAuthProvider, get_oauth_user
 from backend.auth.database import get_db
+from backend.auth import token_pool
 from backend.auth.redis_client import get_redis
-from backend.auth.audit_utils import log_auth_event, create_audit_log
-from backend.workspaces.models import Workspace
-from backend.tenders.tenders_utils import MongoDB, delete_tenders_by_workspace
+from backend.auth.audit_utils import (
+    log_auth_event,
+    create_audit_log,
+    create_audit_log_sync,
+    get_request_ctx,
+    record_failed_auth,
+    detect_suspicious_activity,
+)
+from backend.tenders.tenders_utils import MongoDB, delete_tenders_by_workspaces
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# OAuth provider config comes from the environment and is fixed at startup
+_PROVIDERS_RESPONSE = {
+    "enabled_providers": sorted(ENABLED_PROVIDERS),
+    "available_providers": ["google", "facebook", "github", "microsoft"]
+}
 
 async def get_or_create_oauth_user(
     db: AsyncSession,
@@ -57,26 +71,47 @@ async def get_or_create_oauth_user(
     Returns:
         User object
     """
-    # First, try to find by OAuth provider and ID
+    # Single round-trip: fetch the user matching the OAuth identity and/or the
+    # email (at most two rows, since email is unique) and dispatch in Python.
+    # Only the columns this function reads or updates (hashed_password is
+    # needed for the account-takeover check below). lambda_stmt caches the
+    # compiled SQL; only the three values are bound per call.
+    provider, oauth_id, email = oauth_info.oauth_provider, oauth_info.oauth_id, oauth_info.email
     result = await db.execute(
-        select(User).where(
-            User.oauth_provider == oauth_info.oauth_provider,
-            User.oauth_id == oauth_info.oauth_id
+        lambda_stmt(
+            lambda: select(User).options(
+                load_only(
+                    User.id, User.email, User.full_name, User.profile_picture,
+                    User.oauth_provider, User.oauth_id, User.hashed_password
+                )
+            ).where(
+                or_(
+                    and_(User.oauth_provider == provider, User.oauth_id == oauth_id),
+                    User.email == email
+                )
+            )
         )
     )
-    user = result.scalar_one_or_none()
+    candidates = result.scalars().all()
+    user = next(
+        (
+            u for u in candidates
+            if u.oauth_provider == oauth_info.oauth_provider and u.oauth_id == oauth_info.oauth_id
+        ),
+        None
+    )
     
     if user:
-        # Update user info in case it changed
-        user.full_name = oauth_info.full_name
-        user.profile_picture = oauth_info.profile_picture
-        await db.commit()
-        await db.refresh(user)
+        # Update user info in case it changed (skip the write otherwise)
+        if (user.full_name, user.profile_picture) != (oauth_info.full_name, oauth_info.profile_picture):
+            user.full_name = oauth_info.full_name
+            user.profile_picture = oauth_info.profile_picture
+            await db.commit()
         return user
 
     # Security Check: Prevent account takeover.
     # Check if a user with this email already exists.
-    existing_user = await get_user_by_email(db, oauth_info.email)
+    existing_user = next((u for u in candidates if u.email == oauth_info.email), None)
 
     if existing_user:
         # If the user exists and is a password-based user or uses a different OAuth provider,
@@ -96,24 +131,33 @@ async def get_or_create_oauth_user(
             existing_user.full_name = oauth_info.full_name
             existing_user.profile_picture = oauth_info.profile_picture
             await db.commit()
-            await db.refresh(existing_user)
             return existing_user
 
-    # Create new user if no account exists with this email
-    new_user = User(
-        email=oauth_info.email,
-        full_name=oauth_info.full_name,
-        oauth_provider=oauth_info.oauth_provider,
-        oauth_id=oauth_info.oauth_id,
-        profile_picture=oauth_info.profile_picture,
-        is_active=True,
-        hashed_password=None  # OAuth users don't have passwords
+    # Create new user if no account exists with this email. Same single
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING as signup, so the
+    # server-generated timestamps come back without a refresh
+    stmt = (
+        pg_insert(User)
+        .values(
+            email=oauth_info.email,
+            full_name=oauth_info.full_name,
+            oauth_provider=oauth_info.oauth_provider,
+            oauth_id=oauth_info.oauth_id,
+            profile_picture=oauth_info.profile_picture,
+            is_active=True,
+            hashed_password=None  # OAuth users don't have passwords
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
     )
+    new_user = (await db.execute(stmt)).scalar_one_or_none()
+    if new_user is None:
+        # The account was created concurrently (e.g. a repeated callback):
+        # dispatch again against the row that won the race
+        await db.rollback()
+        return await get_or_create_oauth_user(db, oauth_info)
     
-    db.add(new_user)
     await db.commit()
-    await db.refresh(new_user)
-    
     return new_user
 
 
@@ -123,8 +167,26 @@ async def signup(
     request: Request,
     db: Any = Depends(get_db)
 ) -> UserResponse:
-    existing_user = await get_user_by_email(db, user_data.email)
-    if existing_user:
+    # Single INSERT ... ON CONFLICT (email) DO NOTHING RETURNING: no pre-check
+    # SELECT and no refresh; a duplicate email (also under concurrent signups)
+    # simply returns no row
+    hashed_password = await get_password_hash(user_data.password)
+    stmt = (
+        pg_insert(User)
+        .values(
+            email=user_data.email,
+            hashed_password=hashed_password,
+            full_name=user_data.full_name,
+            is_active=True,
+            oauth_provider=None
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    new_user = (await db.execute(stmt)).scalar_one_or_none()
+
+    if new_user is None:
+        await db.rollback()
         await log_auth_event(
             db=db,
             action=AuditAction.LOGIN_FAILED,
@@ -137,43 +199,36 @@ async def signup(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(
-        email=user_data.email,
-        hashed_password=hashed_password,
-        full_name=user_data.full_name,
-        is_active=True,
-        oauth_provider=None
+
+    await db.commit()
+    await log_auth_event(
+        db=db,
+        action=AuditAction.LOGIN_SUCCESS,
+        user_id=new_user.id,
+        email=new_user.email,
+        success=True,
+        request=request,
+        details="Local account created"
     )
-    
-    try:
-        db.add(new_user)
-        await db.commit()
-        await db.refresh(new_user)
-        await log_auth_event(
-            db=db,
-            action=AuditAction.LOGIN_SUCCESS,
-            user_id=new_user.id,
-            email=new_user.email,
-            success=True,
-            request=request,
-            details="Local account created"
-        )
-        return new_user
-    except IntegrityError:
-        await db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Error creating user. Email may already exist."
-        )
+    return new_user
+
+async def _record_failed_login(db: AsyncSession, redis: Any, ip_address: str | None) -> None:
+    """
+    Cuenta el login fallido de la IP en Redis y avisa si acumula demasiados
+    fallos recientes. Solo informa: no bloquea la IP (detrás de un NAT o proxy
+    bloquearía también a los usuarios legítimos).
+    """
+    await record_failed_auth(redis, ip_address)
+    if ip_address and await detect_suspicious_activity(db, ip_address=ip_address, redis_client=redis):
+        logger.warning("Suspicious login activity: too many failed attempts from %s", ip_address)
 
 @router.post("/login", response_model=Token)
 async def login(
     request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Any = Depends(get_db)
+    db: Any = Depends(get_db),
+    redis: Any = Depends(get_redis)
 ) -> Token:
     user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
@@ -185,14 +240,14 @@ async def login(
             request=request,
             details="Invalid credentials"
         )
+        await _record_failed_login(db, redis, get_request_ctx(request).ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.email, "user_id": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": user.email, "user_id": str(user.id)})
+    access_token, refresh_token = create_token_pair(user)
     set_refresh_token_cookie(response, refresh_token)
     await log_auth_event(
         db=db,
@@ -209,7 +264,8 @@ async def login_json(
     request: Request,
     response: Response,
     credentials: UserLogin,
-    db: Any = Depends(get_db)
+    db: Any = Depends(get_db),
+    redis: Any = Depends(get_redis)
 ) -> Token:
     user = await authenticate_user(db, credentials.email, credentials.password)
     if not user:
@@ -221,14 +277,14 @@ async def login_json(
             request=request,
             details="Invalid JSON login"
         )
+        await _record_failed_login(db, redis, get_request_ctx(request).ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.email, "user_id": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": user.email, "user_id": str(user.id)})
+    access_token, refresh_token = create_token_pair(user)
     set_refresh_token_cookie(response, refresh_token)
     await log_auth_event(
         db=db,
@@ -248,7 +304,7 @@ async def oauth_login(
     db: Any = Depends(get_db),
     redis: Any = Depends(get_redis)
 ):
-    if provider not in OAuthConfig.get_enabled_providers():
+    if provider not in ENABLED_PROVIDERS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"OAuth provider '{provider}' is not enabled or configured"
@@ -262,7 +318,7 @@ async def oauth_login(
         details=f"Initiating OAuth login with {provider}"
     )
     
-    state = secrets.token_urlsafe(32)
+    state = token_pool.get_token()  # 128 bits: ample for a 10-minute single-use CSRF state
     await store_oauth_state(redis, state, provider)
     
     oauth = OAuthProvider(provider)
@@ -316,8 +372,7 @@ async def oauth_callback(
         )
     
     user = await get_or_create_oauth_user(db, oauth_info)
-    access_token = create_access_token(data={"sub": user.email, "user_id": str(user.id)})
-    refresh_token = create_refresh_token(data={"sub": user.email, "user_id": str(user.id)})
+    access_token, refresh_token = create_token_pair(user)
     set_refresh_token_cookie(response, refresh_token)
     
     await log_auth_event(
@@ -332,6 +387,27 @@ async def oauth_callback(
     
     return Token(access_token=access_token, token_type="bearer")
 
+# Rotaciones de refresh token en curso en este proceso, por JTI del token usado
+_pending_refresh: dict[str, asyncio.Future] = {}
+
+
+async def _rotate_refresh_token(db: Any, redis: Any, jti: str | None, email: str) -> tuple[str, str]:
+    """Revoca el refresh token usado y emite un nuevo par (access, refresh)."""
+    # Comprobar y revocar el refresh token en un solo round-trip (SET NX):
+    # si ya estaba en la lista negra, el token se está reutilizando
+    if jti and not await revoke_token_once(redis, jti, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60):
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+    
+    # Only id/email/is_active are needed to issue the new tokens
+    user = (await db.execute(
+        lambda_stmt(lambda: select(User.id, User.email, User.is_active).where(User.email == email))
+    )).one_or_none()
+    if not user or not user.is_active:
+        raise HTTPException(status_code=401, detail="User inactive or not found")
+    
+    return create_token_pair(user)
+
+
 @router.post("/refresh", response_model=Token, summary="Refresh access token using refresh token from cookie", tags=["Authentication"])
 async def refresh_access_token(
     request: Request,
@@ -347,29 +423,76 @@ async def refresh_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(refresh_token)
         email: str = payload.get("sub")
         jti: str = payload.get("jti")
         if email is None or payload.get("type") != "refresh":
             raise HTTPException(status_code=401, detail="Invalid refresh token")
-        if jti and await is_token_blacklisted(redis, jti):
-            raise HTTPException(status_code=401, detail="Refresh token has been revoked")
-    except JWTError:
+    except PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
     
-    user = await get_user_by_email(db, email)
-    if not user or not user.is_active:
-        raise HTTPException(status_code=401, detail="User inactive or not found")
+    # Peticiones simultáneas con el mismo refresh token (p. ej. varias pestañas
+    # o llamadas en paralelo al expirar el access token) comparten una única
+    # rotación en lugar de competir y recibir todas menos una "revoked"
+    tokens = None
+    while jti and tokens is None and (pending := _pending_refresh.get(jti)) is not None:
+        try:
+            tokens = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # Solo se propaga si la cancelada es esta petición; si lo fue la que
+            # rotaba el token, esta vuelve a intentarlo (y puede pasar a rotarlo)
+            if not pending.cancelled() or asyncio.current_task().cancelling():
+                raise
+        except HTTPException as e:
+            # Excepción propia: la de la otra petición no se comparte entre respuestas
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=e.detail,
+                headers=dict(e.headers) if e.headers else None,
+            ) from None
+        except Exception:
+            # Error inesperado de la otra petición: esta lo intenta por su cuenta
+            pass
     
-    if jti:
-        await add_token_to_blacklist(redis, jti, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
+    if tokens is not None:
+        new_access_token, new_refresh_token = tokens
+    elif jti:
+        future = asyncio.get_running_loop().create_future()
+        # Evita el aviso "exception was never retrieved" si nadie más espera
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        _pending_refresh[jti] = future
+        try:
+            new_access_token, new_refresh_token = await _rotate_refresh_token(db, redis, jti, email)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result((new_access_token, new_refresh_token))
+        finally:
+            _pending_refresh.pop(jti, None)
+    else:
+        new_access_token, new_refresh_token = await _rotate_refresh_token(db, redis, jti, email)
     
-    new_access_token = create_access_token(data={"sub": user.email, "user_id": str(user.id)})
-    new_refresh_token = create_refresh_token(data={"sub": user.email, "user_id": str(user.id)})
     set_refresh_token_cookie(response, new_refresh_token)
     
     return Token(access_token=new_access_token, token_type="bearer")
 
+def _blacklist_entry(token: str) -> tuple[str, int] | None:
+    """(jti, segundos de vida restantes) de un token válido, o None."""
+    try:
+        payload = decode_token(token)
+    except PyJWTError:
+        return None
+    jti = payload.get("jti")
+    ttl = int(payload["exp"] - time.time())
+    if jti and ttl > 0:
+        return jti, ttl
+    return None
+
+
 @router.post("/logout")
 async def logout(
     request: Request,
@@ -380,25 +503,19 @@ async def logout(
     """
     Logout endpoint that invalidates both access and refresh tokens.
     """
-    # Invalidar el access token
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        jti = payload.get("jti")
-        if jti:
-            await add_token_to_blacklist(redis, jti, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
-    except JWTError:
-        pass
-    
-    # Invalidar el refresh token de la cookie
+    # decode_token reutiliza el payload ya verificado del access token (lo validó
+    # get_current_user en peticiones anteriores), así que no se repite el HMAC
+    entries = [_blacklist_entry(token)]
+    
+    # Invalidar también el refresh token de la cookie
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token:
-        try:
-            payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
-            jti = payload.get("jti")
-            if jti:
-                await add_token_to_blacklist(redis, jti, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
-        except JWTError:
-            pass
+        entries.append(_blacklist_entry(refresh_token))
+    
+    # Ambos JTI van a Redis en un único pipeline
+    entries = [entry for entry in entries if entry]
+    if entries:
+        await add_tokens_to_blacklist(redis, entries)
     
     # Eliminar cookie
     response.delete_cookie(key="refresh_token")
@@ -410,6 +527,8 @@ async def logout(
 
 users_router = APIRouter(prefix="/users", tags=["Users"])
 
+_USER_RESPONSE_COLUMNS = tuple(getattr(User, name) for name in UserResponse.model_fields)
+
 @users_router.get("/me", response_model=UserResponse, summary="Get current user information")
 async def read_users_me(
     request: Request,
@@ -431,90 +550,122 @@ async def read_users_me(
         user_agent=request.headers.get("user-agent")
     )
     
-    user_data_dict = {
-        "id": current_user.id,
-        "email": current_user.email,
-        "full_name": current_user.full_name,
-        "is_active": current_user.is_active,
-        "oauth_provider": current_user.oauth_provider,
-        "profile_picture": current_user.profile_picture,
-        "created_at": current_user.created_at,
-        "updated_at": current_user.updated_at,
-    }
-    return UserResponse.model_validate(user_data_dict)
+    # The response_model validation already builds the UserResponse (FastAPI
+    # keeps a compiled adapter for it); validating here as well would do it twice
+    return current_user
 
 @users_router.patch("/me", response_model=UserResponse, summary="Update current user information")
 async def update_user_me(
     user_update: UserUpdate,
     request: Request,
     db: Any = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Any = Depends(get_current_active_user),
+    redis: Any = Depends(get_redis)
 ) -> UserResponse:
     """
     Update the current authenticated user's information.
     """
-    if user_update.full_name is not None:
-        current_user.full_name = user_update.full_name
-    if user_update.profile_picture is not None:
-        current_user.profile_picture = user_update.profile_picture
+    changes = {
+        field: value
+        for field, value in user_update.model_dump(exclude_unset=True).items()
+        if value is not None
+    }
+    if not changes:
+        return current_user
+    
+    # Single UPDATE ... RETURNING of the response columns only: no prior load,
+    # no refresh afterwards and no User instance to hydrate
+    result = await db.execute(
+        update(User)
+        .where(User.id == current_user.id)
+        .values(**changes)
+        .returning(*_USER_RESPONSE_COLUMNS)
+    )
+    user = result.mappings().first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    db.add(current_user)
     await db.commit()
-    await db.refresh(current_user)
+    await invalidate_cached_user(redis, current_user.email)
     
     await create_audit_log(
         db=db,
         category=AuditCategory.AUTH,
         action=AuditAction.USER_UPDATE,
         user_id=current_user.id,
-        payload=user_update.model_dump(exclude_unset=True),
+        payload=changes,
         success=True,
         ip_address=request.client.host,
         user_agent=request.headers.get("user-agent")
     )
     
-    return current_user
+    return user
+
+# WITH owned AS (SELECT id FROM workspaces WHERE owner_id = :user_id),
+#      deleted AS (DELETE FROM users WHERE id = :user_id RETURNING id)
+# SELECT (SELECT count(*) FROM deleted), (SELECT array_agg(id) FROM owned)
+_owned_workspaces = (
+    select(Workspace.id).where(Workspace.owner_id == bindparam("user_id")).cte("owned")
+)
+_deleted_user = (
+    delete(User).where(User.id == bindparam("user_id")).returning(User.id).cte("deleted")
+)
+_DELETE_USER_STMT = select(
+    select(func.count()).select_from(_deleted_user).scalar_subquery(),
+    select(func.array_agg(_owned_workspaces.c.id)).scalar_subquery(),
+)
+
+async def _delete_workspaces_tenders(workspace_ids: List[str]):
+    """Remove the MongoDB tenders of deleted workspaces (runs as a background task)."""
+    try:
+        await delete_tenders_by_workspaces(MongoDB.database, workspace_ids)
+    except Exception as e:
+        print(f"Error deleting tenders for workspaces {workspace_ids}: {e}")
 
 @users_router.delete("/me", status_code=status.HTTP_204_NO_CONTENT, summary="Delete current user account")
 async def delete_user_me(
     request: Request,
     response: Response,
+    background_tasks: BackgroundTasks,
     db: Any = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Any = Depends(get_current_active_user),
     token: str = Depends(oauth2_scheme),
     redis: Any = Depends(get_redis)
 ):
     """
     Permanently delete the current user's account and all associated data they own.
     """
-    # 1. Capture IDs of workspaces owned by the user before deleting them
-    owned_workspaces_result = await db.execute(
-        select(Workspace.id).where(Workspace.owner_id == current_user.id)
-    )
-    owned_workspace_ids = [str(wid) for wid in owned_workspaces_result.scalars().all()]
+    user_id = current_user.id
+    user_email = current_user.email
     
     try:
-        # 2. Delete the user in PostgreSQL
-        # This will cascade delete: workspaces owned by user, memberships, and audit logs.
-        # We perform this in a transaction.
-        user_id = current_user.id
-        user_email = current_user.email
+        # 1. Delete the user and capture the IDs of the workspaces they own in a
+        # single statement. Both CTEs read the pre-delete snapshot; the FKs
+        # (ON DELETE CASCADE) remove owned workspaces, memberships and
+        # automations, and SET NULL the user's audit logs, inside Postgres.
+        result = await db.execute(_DELETE_USER_STMT, {"user_id": user_id})
+        deleted, owned_ids = result.one()
+        owned_workspace_ids = [str(wid) for wid in owned_ids or ()]
+        if not deleted:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         
-        # 3. Create a final audit log for the deletion BEFORE committing the delete
-        # This ensures the user still exists when the log is created.
-        await create_audit_log(
+        # 2. Final audit log in the same transaction as the delete, so it is
+        # only persisted if the account is actually removed. user_id would be
+        # nulled by the cascade anyway; the id is kept in resource_id.
+        await create_audit_log_sync(
             db=db,
             category=AuditCategory.AUTH,
             action=AuditAction.USER_DELETE,
-            user_id=user_id,
+            resource_type="user",
+            resource_id=str(user_id),
             payload={"email": user_email, "owned_workspaces_deleted": len(owned_workspace_ids)},
             success=True,
             ip_address=request.client.host if request.client else "unknown",
             user_agent=request.headers.get("user-agent")
         )
-
-        await db.delete(current_user)
-        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(
@@ -522,38 +673,29 @@ async def delete_user_me(
             detail=f"Failed to delete user account. Please try again later."
         )
 
-    # 4. If SQL deletion was successful, clean up MongoDB
-    for workspace_id in owned_workspace_ids:
-        await delete_tenders_by_workspace(MongoDB.database, workspace_id)
+    await invalidate_cached_user(redis, user_email)
+
+    # 3. If SQL deletion was successful, clean up MongoDB after the response is sent
+    if owned_workspace_ids:
+        background_tasks.add_task(_delete_workspaces_tenders, owned_workspace_ids)
     
-    # 5. Invalidate the access token in Redis
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        jti = payload.get("jti")
-        if jti:
-            await add_token_to_blacklist(redis, jti, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
-    except JWTError:
-        pass
-    
-    # 6. Invalidate the refresh token from the cookie in Redis
+    # 4. Invalidate the access token in Redis
+    entries = [_blacklist_entry(token)]
+    
+    # 5. Invalidate the refresh token from the cookie in Redis
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token:
-        try:
-            payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
-            jti_refresh = payload.get("jti")
-            if jti_refresh:
-                await add_token_to_blacklist(redis, jti_refresh, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60)
-        except JWTError:
-            pass
+        entries.append(_blacklist_entry(refresh_token))
+    
+    entries = [entry for entry in entries if entry]
+    if entries:
+        await add_tokens_to_blacklist(redis, entries)
 
-    # 7. Clear the refresh token cookie to effectively log the user out
+    # 6. Clear the refresh token cookie to effectively log the user out
     response.delete_cookie(key="refresh_token")
     
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/providers", summary="Get enabled OAuth providers", tags=["OAuth2"])
 async def get_enabled_providers():
-    return {
-        "enabled_providers": OAuthConfig.get_enabled_providers(),
-        "available_providers": ["google", "facebook", "github", "microsoft"]
-    }
\ No newline at end of file
+    return _PROVIDERS_RESPONSE
\ No newline at end of file
@@ -47,6 +47,23 @@ class UserResponse(UserBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CachedUser(BaseModel):
+    """
+    Lightweight user projection cached in Redis for request authentication.
+    Never includes the password hash.
+    """
+    id: UUID
+    email: str
+    full_name: str
+    is_active: bool
+    oauth_provider: str | None = None
+    profile_picture: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
 class Token(BaseModel):
     """Schema for authentication token response."""
     access_token: str = Field(..., description="JWT access token")
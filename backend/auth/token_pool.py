@@ -0,0 +1,36 @@
+"""
+Pre-generated pool of URL-safe random tokens for OAuth state values.
+
+Instead of one os.urandom() syscall per OAuth login, the pool reads
+TOKEN_POOL_SIZE tokens' worth of entropy in a single call and hands them out
+one by one, refilling synchronously when it runs dry. Refills are plain
+function calls (no awaits), so the pool needs no background task or locking.
+"""
+from base64 import urlsafe_b64encode
+from collections import deque
+import os
+import secrets
+
+TOKEN_POOL_SIZE = 1024
+TOKEN_BYTES = 16  # 128 bits, same as secrets.token_urlsafe(16)
+
+_pool: deque[str] = deque()
+
+
+def _refill() -> None:
+    raw = secrets.token_bytes(TOKEN_POOL_SIZE * TOKEN_BYTES)
+    _pool.extend(
+        urlsafe_b64encode(raw[i:i + TOKEN_BYTES]).rstrip(b"=").decode("ascii")
+        for i in range(0, len(raw), TOKEN_BYTES)
+    )
+
+
+def get_token() -> str:
+    """Return a fresh URL-safe token; each token is handed out only once."""
+    if not _pool:
+        _refill()
+    return _pool.popleft()
+
+
+# Forked workers must never hand out the parent's pre-generated tokens
+os.register_at_fork(after_in_child=_pool.clear)
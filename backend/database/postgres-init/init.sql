@@ -1,5 +1,9 @@
 -- Script de inicialización de la base de datos Lizicular
 -- Generado para PostgreSQL 15
+--
+-- Solo se ejecuta sobre un directorio de datos vacío (docker-entrypoint-initdb.d).
+-- Los cambios de esquema de bases de datos existentes son migraciones versionadas
+-- que el backend aplica al arrancar (backend/auth/migrations.py).
 
 -- 1. Crear extensiones necesarias
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
@@ -10,21 +14,6 @@ BEGIN
     IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'workspacerole') THEN
         CREATE TYPE workspacerole AS ENUM ('OWNER', 'ADMIN', 'EDITOR', 'VIEWER');
     END IF;
-    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'auditcategory') THEN
-        CREATE TYPE auditcategory AS ENUM ('AUTH', 'WORKSPACE', 'TENDER', 'DOCUMENT', 'SYSTEM', 'N8N', 'CHATBOT');
-    END IF;
-    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'auditaction') THEN
-        CREATE TYPE auditaction AS ENUM (
-            'LOGIN_SUCCESS', 'LOGIN_FAILED', 'LOGOUT', 'PASSWORD_CHANGE', 'OAUTH_LOGIN', 'USER_VIEW', 'USER_UPDATE', 'USER_DELETE',
-            'WORKSPACE_CREATE', 'WORKSPACE_UPDATE', 'WORKSPACE_DELETE', 'MEMBER_ADD', 'MEMBER_REMOVE', 'ROLE_CHANGE',
-            'TENDER_CREATE', 'TENDER_UPDATE', 'TENDER_DELETE', 'TENDER_VIEW', 'TENDER_ANALYZE',
-            'DOCUMENT_UPLOAD', 'DOCUMENT_DELETE', 'DOCUMENT_EXTRACT',
-            'SYSTEM_ERROR', 'SYSTEM_BACKUP',
-            'AUTOMATION_CREATE', 'AUTOMATION_UPDATE', 'AUTOMATION_DELETE',
-            'WORKFLOW_START', 'WORKFLOW_COMPLETE', 'WORKFLOW_ERROR',
-            'CHATBOT_QUESTION'
-        );
-    END IF;
 END $$;
 
 -- 3. Tabla de Usuarios
@@ -37,11 +26,12 @@ CREATE TABLE IF NOT EXISTS users (
     oauth_provider VARCHAR(50),
     oauth_id VARCHAR(255),
     profile_picture TEXT DEFAULT '/avatar/blue_lizard.png',
-    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX IF NOT EXISTS ix_users_email_active ON users (email, is_active);
+-- Cubriente para el login: id y hash se leen del índice (index-only scan)
+CREATE INDEX IF NOT EXISTS ix_users_email_active ON users (email, is_active) INCLUDE (id, hashed_password);
 CREATE INDEX IF NOT EXISTS ix_users_oauth_provider_id ON users (oauth_provider, oauth_id);
 
 -- 4. Tabla de Workspaces
@@ -69,34 +59,51 @@ CREATE TABLE IF NOT EXISTS workspace_members (
 CREATE INDEX IF NOT EXISTS ix_workspace_members_user_id ON workspace_members (user_id);
 CREATE INDEX IF NOT EXISTS ix_workspace_members_workspace_id ON workspace_members (workspace_id);
 
--- 6. Tabla de Logs de Auditoría
+-- 6. Tabla de Logs de Auditoría (particionada por mes sobre created_at)
 CREATE TABLE IF NOT EXISTS audit_logs (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     user_id UUID REFERENCES users(id) ON DELETE SET NULL,
-    category auditcategory NOT NULL,
-    action auditaction NOT NULL,
+    category VARCHAR(32) NOT NULL,
+    action VARCHAR(32) NOT NULL,
     resource_type VARCHAR(50),
     resource_id VARCHAR(255),
     workspace_id UUID,
     payload JSONB,
-    ip_address VARCHAR(45),
+    ip_address INET,
     user_agent TEXT,
     success BOOLEAN NOT NULL DEFAULT TRUE,
     error_message TEXT,
-    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT ck_audit_category CHECK (category IN ('AUTH', 'WORKSPACE', 'TENDER', 'DOCUMENT', 'SYSTEM', 'N8N', 'CHATBOT')),
+    CONSTRAINT ck_audit_action CHECK (action IN (
+        'LOGIN_SUCCESS', 'LOGIN_FAILED', 'LOGOUT', 'PASSWORD_CHANGE', 'OAUTH_LOGIN', 'USER_VIEW', 'USER_UPDATE', 'USER_DELETE',
+        'WORKSPACE_CREATE', 'WORKSPACE_UPDATE', 'WORKSPACE_DELETE', 'MEMBER_ADD', 'MEMBER_REMOVE', 'ROLE_CHANGE',
+        'TENDER_CREATE', 'TENDER_UPDATE', 'TENDER_DELETE', 'TENDER_VIEW', 'TENDER_ANALYZE',
+        'DOCUMENT_UPLOAD', 'DOCUMENT_DELETE', 'DOCUMENT_EXTRACT',
+        'SYSTEM_ERROR', 'SYSTEM_BACKUP',
+        'AUTOMATION_CREATE', 'AUTOMATION_UPDATE', 'AUTOMATION_DELETE',
+        'WORKFLOW_START', 'WORKFLOW_COMPLETE', 'WORKFLOW_ERROR',
+        'CHATBOT_QUESTION'
+    )),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
 
--- Índices de Auditoría
-CREATE INDEX IF NOT EXISTS ix_audit_logs_user_id ON audit_logs (user_id);
-CREATE INDEX IF NOT EXISTS ix_audit_logs_category ON audit_logs (category);
+-- Partición por defecto; las mensuales (audit_logs_YYYY_MM) las crea la aplicación al arrancar
+CREATE TABLE IF NOT EXISTS audit_logs_default PARTITION OF audit_logs DEFAULT;
+
+-- Índices de Auditoría (se crean en cada partición)
 CREATE INDEX IF NOT EXISTS ix_audit_logs_action ON audit_logs (action);
-CREATE INDEX IF NOT EXISTS ix_audit_logs_created_at ON audit_logs (created_at);
-CREATE INDEX IF NOT EXISTS ix_audit_user_created ON audit_logs (user_id, created_at);
-CREATE INDEX IF NOT EXISTS ix_audit_category_action ON audit_logs (category, action, created_at);
-CREATE INDEX IF NOT EXISTS ix_audit_workspace_created ON audit_logs (workspace_id, created_at);
-CREATE INDEX IF NOT EXISTS ix_audit_resource ON audit_logs (resource_type, resource_id);
-CREATE INDEX IF NOT EXISTS ix_audit_payload ON audit_logs USING GIN (payload);
-CREATE INDEX IF NOT EXISTS ix_audit_failures ON audit_logs (success, created_at) WHERE success = FALSE;
+CREATE INDEX IF NOT EXISTS ix_audit_logs_resource_id ON audit_logs (resource_id);
+CREATE INDEX IF NOT EXISTS ix_audit_user_created ON audit_logs (user_id, created_at DESC)
+    INCLUDE (id, category, action, workspace_id, resource_type, resource_id, success);
+CREATE INDEX IF NOT EXISTS ix_audit_category_action ON audit_logs (category, action, created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_audit_workspace_created ON audit_logs (workspace_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_audit_resource ON audit_logs (resource_type, resource_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_audit_created_brin ON audit_logs USING BRIN (created_at) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS ix_audit_payload ON audit_logs USING GIN (payload jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS ix_audit_failures ON audit_logs (created_at DESC) WHERE success = FALSE;
+CREATE INDEX IF NOT EXISTS ix_audit_failed ON audit_logs (success, category, created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_audit_suspicious ON audit_logs (category, ip_address, created_at) WHERE success = FALSE;
 
 -- 7. Tabla de Automatismos
 CREATE TABLE IF NOT EXISTS autos (
@@ -116,4 +123,4 @@ ON CONFLICT (id) DO NOTHING;
 
 INSERT INTO autos (id, url, name, description, owner_id)
 VALUES ('2cf9e384-b633-5c8c-9488-2f47b6796791', 'https://n8n.staging.nazaries.cloud/webhook-test/7dda4f32-7721-405b-aa6d-8e84ded163ce', 'Ticketing Tender Automation', 'This is a default automation for testing purposes.', '00000000-0000-0000-0000-000000000001')
-ON CONFLICT (id) DO NOTHING;
\ No newline at end of file
+ON CONFLICT (id) DO NOTHING;
@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
@@ -22,7 +23,15 @@ from backend.automations.models import Automation  # Import Automation model
 from backend.auth.schemas import OAuthUserInfo
 from backend.auth.oauth_config import OAuthConfig
 from backend.auth.oauth_utils import OAuthProvider, get_oauth_user
-from backend.auth.database import engine
+from backend.auth.database import engine, warm_up_pool
+from backend.auth.migrations import run_migrations, DB_MIGRATE_ON_STARTUP
+from backend.auth.audit_utils import (
+    start_audit_worker, stop_audit_worker, ensure_audit_partitions,
+    start_audit_maintenance, stop_audit_maintenance,
+)
+from backend.auth.auth_utils import start_blacklist_sync, stop_blacklist_sync
+from backend.auth.http_client import startup_http_client, shutdown_http_client
+from backend.auth.redis_client import close_redis
 from backend.tenders.routes import router as tenders_router, analysis_router as analysis_router
 from backend.workspaces.routes import router as workspaces_router
 from backend.auth.routes import router as auth_router, users_router
@@ -43,9 +52,13 @@ async def lifespan(app: FastAPI):
     if langfuse_enabled:
         langfuse = get_client()
 
-    # Startup: PostgreSQL
+    # Startup: PostgreSQL (schema migrations for existing databases first)
+    if DB_MIGRATE_ON_STARTUP:
+        await run_migrations()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all, checkfirst=True)
+    await ensure_audit_partitions()
+    await warm_up_pool()
     
     # Startup: MongoDB
     try:
@@ -59,9 +72,26 @@ async def lifespan(app: FastAPI):
         # Re-raise as a runtime error to halt application startup
         raise RuntimeError("MongoDB connection failed, application cannot start.") from e
 
+    # Startup: Audit log background writer
+    await start_audit_worker()
+
+    # Startup: Periodic audit partition creation and retention
+    await start_audit_maintenance()
+
+    # Startup: Token blacklist Bloom filter sync
+    await start_blacklist_sync()
+
+    # Startup: Shared outbound HTTP client (OAuth providers)
+    await startup_http_client()
+
     yield
     
-    # Shutdown: Dispose engines and clients
+    # Shutdown: Flush pending audit logs, then dispose engines and clients
+    await stop_blacklist_sync()
+    await stop_audit_maintenance()
+    await stop_audit_worker()
+    await shutdown_http_client()
+    await close_redis()
     await engine.dispose()
     await MongoDB.close_database_connection()
     if langfuse:
@@ -74,6 +104,8 @@ app = FastAPI(
     description="Centralized authentication and Tender Management system",
     version="2.1.0",
     lifespan=lifespan,
+    # Serialize every response with orjson instead of the stdlib json module
+    default_response_class=ORJSONResponse,
     json_encoders={
         UUID: lambda uuid: str(uuid)
     }
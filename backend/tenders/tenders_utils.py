@@ -320,16 +320,35 @@ async def delete_tenders_by_workspace(
     workspace_id: str
 ) -> None:
     """
-    Elimina todas las licitaciones y sus documentos asociados para un workspace
-    de forma eficiente y escalable usando una pipeline de agregación.
+    Elimina todas las licitaciones y sus documentos asociados para un workspace.
     
     Args:
         db: Base de datos MongoDB
         workspace_id: UUID del workspace
     """
+    await delete_tenders_by_workspaces(db, [workspace_id])
+
+
+async def delete_tenders_by_workspaces(
+    db: Any,
+    workspace_ids: List[str]
+) -> None:
+    """
+    Elimina todas las licitaciones y sus documentos asociados para varios
+    workspaces a la vez (un único $in por colección en lugar de un recorrido
+    por workspace), usando una pipeline de agregación.
+    
+    Args:
+        db: Base de datos MongoDB
+        workspace_ids: UUIDs de los workspaces
+    """
+    if not workspace_ids:
+        return
+    workspace_filter = {"workspace_id": {"$in": workspace_ids}}
+
     # 1. Obtener todos los IDs de archivos y de análisis para limpiar las colecciones separadas
     pipeline = [
-        {"$match": {"workspace_id": workspace_id}},
+        {"$match": workspace_filter},
         {"$project": {
             "doc_ids": "$documents.id",
             "analysis_ids": "$analysis_results.id"
@@ -354,8 +373,8 @@ async def delete_tenders_by_workspace(
     if analysis_ids_to_delete:
         await db.analysis_results.delete_many({"_id": {"$in": analysis_ids_to_delete}})
         
-    # 4. Eliminar todas las licitaciones del workspace
-    await db.tenders.delete_many({"workspace_id": workspace_id})
+    # 4. Eliminar todas las licitaciones de los workspaces
+    await db.tenders.delete_many(workspace_filter)
 
 
 async def count_tenders_in_workspace(
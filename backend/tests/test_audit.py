@@ -0,0 +1,101 @@
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, func, select
+
+from backend.auth import audit_utils
+from backend.auth.models import AuditAction, AuditCategory, AuditLog
+
+EVENTS = 25
+
+
+@pytest_asyncio.fixture()
+async def audit_resource_id(monkeypatch):
+    """
+    resource_id único para los logs del test. El worker escribe con el engine de la
+    aplicación (fuera de la transacción de db_session), así que se borran al terminar.
+    """
+    # Lotes pequeños para que los eventos se repartan en varios COPY
+    monkeypatch.setattr(audit_utils, "AUDIT_BATCH_SIZE", 10)
+    resource_id = f"audit-test-{uuid.uuid4().hex}"
+    yield resource_id
+
+    await audit_utils.stop_audit_worker()
+    async with audit_utils.engine.begin() as conn:
+        await conn.execute(delete(AuditLog).where(AuditLog.resource_id == resource_id))
+    # El pool del engine de la aplicación queda ligado al event loop de este test
+    await audit_utils.engine.dispose()
+
+
+async def _enqueue_events(resource_id: str) -> None:
+    await audit_utils.start_audit_worker()
+    for i in range(EVENTS):
+        await audit_utils.create_audit_log(
+            None,
+            AuditCategory.SYSTEM,
+            AuditAction.SYSTEM_BACKUP,
+            resource_type="test",
+            resource_id=resource_id,
+            payload={"seq": i},
+        )
+    # stop_audit_worker espera a que la cola se vacíe antes de parar el worker
+    await audit_utils.stop_audit_worker()
+
+
+async def _count_rows(resource_id: str) -> int:
+    async with audit_utils.engine.connect() as conn:
+        result = await conn.execute(
+            select(func.count()).select_from(AuditLog).where(AuditLog.resource_id == resource_id)
+        )
+        return result.scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_audit_worker_writes_every_queued_event(audit_resource_id):
+    """Todos los eventos encolados acaban en audit_logs al vaciar el worker."""
+    await _enqueue_events(audit_resource_id)
+
+    assert audit_utils.AUDIT_QUEUE is None
+    assert await _count_rows(audit_resource_id) == EVENTS
+
+
+@pytest.mark.asyncio
+async def test_audit_worker_falls_back_to_inserts_when_copy_fails(audit_resource_id, monkeypatch):
+    """Si el COPY de un lote falla, las filas se escriben una a una con INSERT."""
+    copy_calls = 0
+
+    async def failing_copy(rows):
+        nonlocal copy_calls
+        copy_calls += 1
+        raise RuntimeError("COPY failed")
+
+    monkeypatch.setattr(audit_utils, "_copy_audit_rows", failing_copy)
+
+    await _enqueue_events(audit_resource_id)
+
+    assert copy_calls >= 1
+    assert await _count_rows(audit_resource_id) == EVENTS
+
+
+@pytest.mark.asyncio
+async def test_create_audit_log_writes_synchronously_without_worker(db_session):
+    """Sin worker arrancado, create_audit_log escribe el log en la sesión y hace commit."""
+    assert audit_utils.AUDIT_QUEUE is None
+    resource_id = f"audit-test-{uuid.uuid4().hex}"
+
+    result = await audit_utils.create_audit_log(
+        db_session,
+        AuditCategory.SYSTEM,
+        AuditAction.SYSTEM_BACKUP,
+        resource_type="test",
+        resource_id=resource_id,
+    )
+
+    assert result is None
+    assert not db_session.in_transaction()
+    logs = (
+        await db_session.execute(select(AuditLog).where(AuditLog.resource_id == resource_id))
+    ).scalars().all()
+    assert len(logs) == 1
+    assert logs[0].action == AuditAction.SYSTEM_BACKUP
@@ -1,6 +1,13 @@
+import asyncio
 import pytest
 from httpx import AsyncClient
 import uuid
+import bcrypt
+from sqlalchemy import select
+
+from backend.auth import auth_utils
+from backend.auth.models import User
+from backend.auth.redis_client import redis_session
 
 @pytest.mark.asyncio
 async def test_signup_success(client):
@@ -36,6 +43,71 @@ async def test_login_generates_cookies(client):
     assert "access_token" in response.json()
     assert "refresh_token" in client.cookies
 
+@pytest.mark.asyncio
+async def test_login_rehashes_legacy_bcrypt_password(client, db_session):
+    """Un hash bcrypt heredado se sustituye por Argon2id en el primer login correcto."""
+    email = f"bcrypt_{uuid.uuid4().hex[:8]}@example.com"
+    password = "LegacyPass123!"
+    db_session.add(User(
+        email=email,
+        hashed_password=bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode(),
+        full_name="Legacy User",
+        is_active=True,
+    ))
+    await db_session.flush()
+    
+    first_res = await client.post("/auth/login", data={"username": email, "password": password})
+    assert first_res.status_code == 200
+    
+    stored_hash = (await db_session.execute(
+        select(User.hashed_password).where(User.email == email)
+    )).scalar_one()
+    assert stored_hash.startswith("$argon2id$")
+    
+    # El nuevo hash sigue validando la misma contraseña
+    second_res = await client.post("/auth/login", data={"username": email, "password": password})
+    assert second_res.status_code == 200
+
+@pytest.mark.asyncio
+async def test_failed_logins_do_not_lock_out_ip(client):
+    """Los fallos repetidos desde una IP solo se registran: el login correcto sigue funcionando."""
+    email = f"af_{uuid.uuid4().hex[:8]}@example.com"
+    password = "FailedPass123!"
+    
+    await client.post("/auth/signup", json={
+        "email": email, "password": password, "full_name": "Failed Login User"
+    })
+    
+    for _ in range(6):
+        res = await client.post("/auth/login", data={"username": email, "password": "wrong"})
+        assert res.status_code == 401
+    
+    res = await client.post("/auth/login", data={"username": email, "password": password})
+    assert res.status_code == 200
+
+@pytest.mark.asyncio
+async def test_login_unknown_email_still_verifies_hash(client, monkeypatch):
+    """Un email inexistente también pasa por la verificación del hash (contra el hash ficticio)."""
+    verified_hashes = []
+    hasher = auth_utils._password_hasher
+    
+    class SpyHasher:
+        def verify(self, hashed_password, password):
+            verified_hashes.append(hashed_password)
+            return hasher.verify(hashed_password, password)
+        
+        def __getattr__(self, name):
+            return getattr(hasher, name)
+    
+    monkeypatch.setattr(auth_utils, "_password_hasher", SpyHasher())
+    
+    res = await client.post("/auth/login", data={
+        "username": f"unknown_{uuid.uuid4().hex[:8]}@example.com", "password": "Whatever123!"
+    })
+    
+    assert res.status_code == 401
+    assert verified_hashes == [auth_utils._DUMMY_HASH]
+
 @pytest.mark.asyncio
 async def test_refresh_token_flow(client):
     """Prueba el flujo completo de refresco de token."""
@@ -57,6 +129,26 @@ async def test_refresh_token_flow(client):
     assert "access_token" in refresh_res.json()
     assert "refresh_token" in client.cookies
 
+@pytest.mark.asyncio
+async def test_concurrent_refresh_share_rotation(client):
+    """Dos /refresh simultáneos con la misma cookie reciben el mismo par rotado."""
+    email = f"refresh_conc_{uuid.uuid4().hex[:8]}@example.com"
+    password = "RefreshPass123!"
+    
+    await client.post("/auth/signup", json={
+        "email": email, "password": password, "full_name": "Concurrent Refresh User"
+    })
+    await client.post("/auth/login", data={"username": email, "password": password})
+    old_refresh_token = client.cookies.get("refresh_token")
+    
+    res1, res2 = await asyncio.gather(client.post("/auth/refresh"), client.post("/auth/refresh"))
+    
+    assert res1.status_code == 200
+    assert res2.status_code == 200
+    assert res1.json()["access_token"] == res2.json()["access_token"]
+    assert res1.cookies.get("refresh_token") == res2.cookies.get("refresh_token")
+    assert res1.cookies.get("refresh_token") != old_refresh_token
+
 @pytest.mark.asyncio
 async def test_logout_clears_cookie(client):
     """Verifica que el logout elimine la cookie de refresh token."""
@@ -153,6 +245,60 @@ async def test_token_blacklisting_on_logout(client):
     assert me_res_retry.status_code == 401
     assert "revoked" in me_res_retry.json()["detail"].lower()
 
+async def _wait_for(condition, timeout: float = 2.0):
+    """Espera a que el worker de sincronización del filtro Bloom cumpla la condición."""
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not met in time")
+
+@pytest.mark.asyncio
+async def test_token_blacklisting_with_bloom_filter_active(client):
+    """Con el filtro Bloom activo, un token revocado en el logout sigue siendo rechazado."""
+    email = f"bloom_{uuid.uuid4().hex[:8]}@example.com"
+    password = "BloomPass123!"
+    
+    await client.post("/auth/signup", json={"email": email, "password": password, "full_name": "Bloom User"})
+    login_res = await client.post("/auth/login", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+    
+    await _wait_for(lambda: auth_utils._blacklist_bloom_ready)
+    assert (await client.get("/users/me", headers=headers)).status_code == 200
+    
+    logout_res = await client.post("/auth/logout", headers=headers)
+    assert logout_res.status_code == 200
+    
+    # Sin la caché en memoria, la comprobación pasa por el filtro Bloom y después por Redis
+    auth_utils._blacklist_cache.clear()
+    me_res = await client.get("/users/me", headers=headers)
+    assert me_res.status_code == 401
+    assert "revoked" in me_res.json()["detail"].lower()
+
+@pytest.mark.asyncio
+async def test_blacklist_sync_applies_revocations_from_other_workers(client):
+    """Un JTI revocado por otro worker llega al filtro Bloom local por pub/sub."""
+    email = f"bloom_pubsub_{uuid.uuid4().hex[:8]}@example.com"
+    password = "BloomPass123!"
+    
+    await client.post("/auth/signup", json={"email": email, "password": password, "full_name": "Bloom User"})
+    login_res = await client.post("/auth/login", data={"username": email, "password": password})
+    token = login_res.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    jti = auth_utils.decode_token(token)["jti"]
+    
+    await _wait_for(lambda: auth_utils._blacklist_bloom_ready)
+    assert jti not in auth_utils._blacklist_bloom
+    
+    # Otro worker revoca el token: escribe en Redis y lo publica, sin tocar este proceso
+    async with redis_session() as redis_client:
+        await redis_client.setex(f"blacklist:{jti}", 60, "true")
+        await redis_client.publish(auth_utils.BLACKLIST_CHANNEL, jti)
+    await _wait_for(lambda: jti in auth_utils._blacklist_bloom)
+    
+    auth_utils._blacklist_cache.clear()
+    assert (await client.get("/users/me", headers=headers)).status_code == 401
+
 @pytest.mark.asyncio
 async def test_refresh_token_rotation_security(client):
     """
@@ -223,4 +369,56 @@ async def test_delete_user_me(client):
     
     # Try to access me after deletion
     me_res_after = await client.get("/users/me", headers=headers)
-    assert me_res_after.status_code == 401
\ No newline at end of file
+    assert me_res_after.status_code == 401
+
+@pytest.mark.asyncio
+async def test_update_user_me_invalidates_cached_user(client):
+    """Tras actualizar el perfil, /users/me devuelve los datos nuevos y no los cacheados."""
+    email = f"cache_upd_{uuid.uuid4().hex[:8]}@example.com"
+    password = "CachePass123!"
+    
+    await client.post("/auth/signup", json={"email": email, "password": password, "full_name": "Cache User"})
+    login_res = await client.post("/auth/login", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+    
+    # Primera lectura: el usuario queda cacheado en memoria y en Redis
+    assert (await client.get("/users/me", headers=headers)).json()["full_name"] == "Cache User"
+    async with redis_session() as redis_client:
+        assert await redis_client.exists(auth_utils.user_cache_key(email))
+    
+    update_res = await client.patch("/users/me", json={"full_name": "Renamed User"}, headers=headers)
+    assert update_res.status_code == 200
+    
+    async with redis_session() as redis_client:
+        assert not await redis_client.exists(auth_utils.user_cache_key(email))
+    assert email not in auth_utils._user_cache
+    
+    me_res = await client.get("/users/me", headers=headers)
+    assert me_res.status_code == 200
+    assert me_res.json()["full_name"] == "Renamed User"
+
+@pytest.mark.asyncio
+async def test_delete_user_me_invalidates_cached_user(client):
+    """Tras borrar la cuenta, otro token aún válido del usuario no se resuelve desde la caché."""
+    email = f"cache_del_{uuid.uuid4().hex[:8]}@example.com"
+    password = "CachePass123!"
+    
+    await client.post("/auth/signup", json={"email": email, "password": password, "full_name": "Cache User"})
+    first_login = await client.post("/auth/login", data={"username": email, "password": password})
+    second_login = await client.post("/auth/login", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {first_login.json()['access_token']}"}
+    other_headers = {"Authorization": f"Bearer {second_login.json()['access_token']}"}
+    
+    # El segundo token cachea el usuario y no se revoca al borrar con el primero
+    assert (await client.get("/users/me", headers=other_headers)).status_code == 200
+    
+    delete_res = await client.delete("/users/me", headers=headers)
+    assert delete_res.status_code == 204
+    
+    async with redis_session() as redis_client:
+        assert not await redis_client.exists(auth_utils.user_cache_key(email))
+    assert email not in auth_utils._user_cache
+    
+    me_res = await client.get("/users/me", headers=other_headers)
+    assert me_res.status_code == 401
+    assert me_res.json()["detail"] == "Could not validate credentials"
@@ -0,0 +1,53 @@
+import fakeredis.aioredis
+import pytest
+from rbloom import Bloom
+
+from backend.auth import auth_utils
+
+
+@pytest.fixture()
+def fake_redis():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_blacklist_cache():
+    auth_utils._blacklist_cache.clear()
+    yield
+    auth_utils._blacklist_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_build_blacklist_bloom_contains_blacklisted_jtis(fake_redis):
+    """La reconstrucción del filtro Bloom incluye todos los JTI de la lista negra de Redis."""
+    jtis = [f"jti-{i}" for i in range(50)]
+    for jti in jtis:
+        await fake_redis.setex(f"blacklist:{jti}", 60, "true")
+    await fake_redis.set("oauth_state:abc", "google")
+
+    bloom = await auth_utils._build_blacklist_bloom(fake_redis)
+
+    assert all(jti in bloom for jti in jtis)
+    assert "abc" not in bloom
+    assert "jti-unknown" not in bloom
+
+
+@pytest.mark.asyncio
+async def test_is_token_blacklisted_skips_redis_when_bloom_rules_it_out(fake_redis, monkeypatch):
+    """Con el filtro listo, un JTI que no está en él se da por válido sin consultar Redis."""
+    await fake_redis.setex("blacklist:jti-1", 60, "true")
+    monkeypatch.setattr(auth_utils, "_blacklist_bloom", Bloom(1000, 0.001))
+    monkeypatch.setattr(auth_utils, "_blacklist_bloom_ready", True)
+
+    assert await auth_utils.is_token_blacklisted(fake_redis, "jti-1") is False
+
+
+@pytest.mark.asyncio
+async def test_is_token_blacklisted_falls_through_to_redis_when_bloom_not_ready(fake_redis, monkeypatch):
+    """Mientras el filtro no esté listo, la comprobación va siempre a Redis."""
+    await fake_redis.setex("blacklist:jti-1", 60, "true")
+    monkeypatch.setattr(auth_utils, "_blacklist_bloom", Bloom(1000, 0.001))
+    monkeypatch.setattr(auth_utils, "_blacklist_bloom_ready", False)
+
+    assert await auth_utils.is_token_blacklisted(fake_redis, "jti-1") is True
+    assert await auth_utils.is_token_blacklisted(fake_redis, "jti-2") is False
@@ -0,0 +1,100 @@
+import hashlib
+from datetime import timedelta
+
+import jwt
+import pytest
+
+from backend.auth import auth_utils
+from backend.auth.jwt_cache import SieveCache
+
+
+def test_sieve_cache_hit_and_miss():
+    """Una clave guardada se devuelve; una ausente devuelve el valor por defecto."""
+    cache = SieveCache(maxsize=2)
+    cache["a"] = 1
+
+    assert cache.get("a") == 1
+    assert "a" in cache
+    assert cache.get("b") is None
+    assert cache.get("b", "default") == "default"
+    assert len(cache) == 1
+
+
+def test_sieve_cache_evicts_oldest_unvisited():
+    """Al llenarse se expulsa la entrada más antigua que no ha sido leída."""
+    cache = SieveCache(maxsize=3)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache["c"] = 3
+    cache.get("a")  # marca "a" como visitada
+
+    cache["d"] = 4
+
+    # La mano salta "a" (borrando su bit) y expulsa "b"
+    assert "b" not in cache
+    assert [key in cache for key in ("a", "c", "d")] == [True, True, True]
+    assert len(cache) == 3
+
+
+def test_sieve_cache_visited_bit_is_cleared_by_the_hand():
+    """Una entrada visitada solo sobrevive a una pasada de la mano."""
+    cache = SieveCache(maxsize=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache.get("a")
+
+    cache["c"] = 3  # la mano limpia el bit de "a" y expulsa "b"
+    cache["d"] = 4  # "a" ya no está visitada: se expulsa
+
+    assert "a" not in cache
+    assert "b" not in cache
+    assert "c" in cache and "d" in cache
+
+
+def test_sieve_cache_hand_wraps_around():
+    """Si todas las entradas están visitadas, la mano da la vuelta y expulsa la más antigua."""
+    cache = SieveCache(maxsize=3)
+    for key in ("a", "b", "c"):
+        cache[key] = key
+        cache.get(key)
+
+    cache["d"] = "d"
+
+    assert "a" not in cache
+    assert [key in cache for key in ("b", "c", "d")] == [True, True, True]
+
+    # Tras la vuelta, la mano sigue por "b", ya sin bit de visita
+    cache["e"] = "e"
+    assert "b" not in cache
+    assert [key in cache for key in ("c", "d", "e")] == [True, True, True]
+
+
+def test_sieve_cache_pop_under_the_hand():
+    """Eliminar la entrada bajo la mano no rompe las expulsiones siguientes."""
+    cache = SieveCache(maxsize=3)
+    for key in ("a", "b", "c"):
+        cache[key] = key
+    cache.get("b")
+    cache["d"] = "d"  # expulsa "a"; la mano queda en "b"
+
+    assert cache.pop("b") == "b"
+    cache["e"] = "e"
+    cache["f"] = "f"
+
+    # La mano continuó desde "c" (la siguiente a "b"), no desde la entrada eliminada
+    assert "c" not in cache
+    assert [key in cache for key in ("d", "e", "f")] == [True, True, True]
+
+
+def test_decode_token_ignores_expired_cached_payload():
+    """decode_token no devuelve un payload cacheado cuyo exp ya ha pasado."""
+    token = auth_utils.create_access_token({"sub": "expired@example.com"}, timedelta(seconds=-10))
+    payload = jwt.decode(
+        token, auth_utils.SECRET_KEY, algorithms=[auth_utils.ALGORITHM], options={"verify_exp": False}
+    )
+    # Simula que el token se verificó mientras seguía vigente
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    auth_utils._token_cache[key] = payload
+
+    with pytest.raises(jwt.ExpiredSignatureError):
+        auth_utils.decode_token(token)
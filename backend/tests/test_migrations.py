@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import text
+
+from backend.auth import migrations
+
+
+async def _fetch_scalars(statement: str) -> list:
+    async with migrations.engine.connect() as conn:
+        result = await conn.execute(text(statement))
+        return list(result.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_run_migrations_is_idempotent():
+    """Una segunda ejecución no aplica nada y el esquema queda registrado y particionado."""
+    try:
+        await migrations.run_migrations()
+        assert await migrations.run_migrations() == []
+
+        versions = await _fetch_scalars("SELECT version FROM schema_migrations ORDER BY version")
+        assert versions == [version for version, _, _ in migrations.MIGRATIONS]
+
+        relkind = await _fetch_scalars("SELECT relkind FROM pg_class WHERE oid = 'audit_logs'::regclass")
+        assert relkind == ["p"]
+
+        partitions = await _fetch_scalars(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'audit_logs'::regclass"
+        )
+        assert "audit_logs_default" in partitions
+        assert await _fetch_scalars("SELECT to_regclass('audit_logs_legacy')") == [None]
+    finally:
+        # El pool del engine de la aplicación queda ligado al event loop de este test
+        await migrations.engine.dispose()
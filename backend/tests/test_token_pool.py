@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from backend.auth import token_pool
+
+
+def test_get_token_refills_when_drained():
+    """Al vaciarse el pool se rellena con TOKEN_POOL_SIZE tokens nuevos."""
+    token_pool._pool.clear()
+
+    token = token_pool.get_token()
+
+    assert token
+    assert len(token_pool._pool) == token_pool.TOKEN_POOL_SIZE - 1
+
+
+def test_tokens_are_unique_across_refills():
+    """Ningún token se repite, tampoco entre rellenos sucesivos del pool."""
+    token_pool._pool.clear()
+    draws = token_pool.TOKEN_POOL_SIZE * 3 + 1
+
+    tokens = [token_pool.get_token() for _ in range(draws)]
+
+    assert len(set(tokens)) == draws
+    # 16 bytes en base64 URL-safe sin relleno
+    assert all(len(token) == 22 for token in tokens)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_forked_child_starts_with_empty_pool():
+    """Un proceso hijo no reutiliza los tokens pregenerados por el padre."""
+    token_pool._pool.clear()
+    token_pool.get_token()
+    parent_tokens = set(token_pool._pool)
+    assert parent_tokens
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Proceso hijo: informa del tamaño del pool y de un token nuevo
+        try:
+            os.close(read_fd)
+            size = len(token_pool._pool)
+            token = token_pool.get_token()
+            os.write(write_fd, f"{size} {token}".encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        size, child_token = pipe.read().split()
+    os.waitpid(pid, 0)
+
+    assert size == "0"
+    assert child_token not in parent_tokens
@@ -60,7 +60,7 @@ async def create_workspace(
     
     member = WorkspaceMember(
         workspace=new_workspace,
-        user=current_user,
+        user_id=current_user.id,
         role=WorkspaceRole.OWNER
     )
     